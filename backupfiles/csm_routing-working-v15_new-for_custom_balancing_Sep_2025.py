@@ -1759,15 +1759,32 @@ def initialize_problem(df, num_csms, new_csms, csms_to_remove, removed_csm_accou
 
 
 
-def solve_problem(df, new_csm_list, new_csms, csms_to_remove, fixed_assignments, restricted_assignments, parent_child_accounts, csm_groups, removed_csm_accounts, category_limits, industry_csm_mapping,  mt_count_lt_5_csms, mt_count_gte_5_csms,  csm_timezone_mapping, max_accounts_per_csm=1000, ):
+solve_history = []
+
+def get_solver(backend='cbc', time_limit=300, gap_rel=None, threads=None):
+    ''' Function to build the PuLP solver for a backend (cbc or highs) '''
+    if backend == 'highs':
+        solver = pulp.HiGHS(msg=False, timeLimit=time_limit, gapRel=gap_rel, threads=threads)
+        if solver.available():
+            return solver
+        print('highspy is not installed - falling back to CBC')
+    return pulp.PULP_CBC_CMD(msg=0, timeLimit=time_limit, gapRel=gap_rel, threads=threads)
+
+def solve_problem(df, new_csm_list, new_csms, csms_to_remove, fixed_assignments, restricted_assignments, parent_child_accounts, csm_groups, removed_csm_accounts, category_limits, industry_csm_mapping,  mt_count_lt_5_csms, mt_count_gte_5_csms,  csm_timezone_mapping, max_accounts_per_csm=1000, solver_backend='cbc', time_limit=300, gap_rel=None, threads=None):
     ''' Function to solve the optimization problem '''
     
     csm_mapping = {csm: i for i, csm in enumerate(new_csm_list)}
     
     num_csms = len(new_csm_list)
     prob, x = initialize_problem(df, num_csms, new_csms, csms_to_remove, removed_csm_accounts, csm_mapping, fixed_assignments, restricted_assignments, parent_child_accounts, csm_groups, category_limits, industry_csm_mapping, mt_count_lt_5_csms, mt_count_gte_5_csms, csm_timezone_mapping,  max_accounts_per_csm)
-    #prob.solve(pulp.PULP_CBC_CMD( timeLimit=300))
-    prob.solve()
+    threads = threads or os.cpu_count() or 1  # all cores by default
+    solver = get_solver(solver_backend, time_limit, gap_rel, threads)
+    start_time = time.time()
+    prob.solve(solver)
+    solve_seconds = time.time() - start_time
+    solve_history.append({'backend': solver.name, 'status': pulp.LpStatus[prob.status], 'solution_status': pulp.LpSolution[prob.sol_status],
+                          'objective': pulp.value(prob.objective), 'solve_seconds': solve_seconds, 'threads': threads})
+    print(f'{solver.name}: {pulp.LpStatus[prob.status]} in {solve_seconds:.1f}s')
     num_accounts = len(df)
     assignments = [(i, j) for i in range(num_accounts) for j in range(num_csms) if pulp.value(x[i, j]) == 1]
     optimized_df = df.copy()
@@ -3328,65 +3345,44 @@ def calculate_cost(df):
     green_variance = grouped['green_count'].var()
     return neediness_variance, red_variance, yellow_variance, green_variance
 
-# Initialize best cost and best assignment
-best_cost = (float('inf'), float('inf'), float('inf'), float('inf'))
-best_assignment = None
-
-# Perform iterations for neediness variance
-for _ in range(100):
-    df['new_csm'] = df['new_csm_name']
-    for account_id in departing_accounts['account_id']:
-        new_csm = np.random.choice(remaining_csms)
-        df.loc[df['account_id'] == account_id, 'new_csm'] = new_csm
-    cost = calculate_cost(df)
-    if cost[0] < best_cost[0]:
-        best_cost = cost
-        best_assignment = df['new_csm'].copy()
-
-# Apply the best assignment for neediness variance
-df['new_csm'] = best_assignment
-
-# Perform iterations for red variance
-for _ in range(100):
-    df['new_csm'] = df['new_csm_name']
-    for account_id in departing_accounts['account_id']:
-        new_csm = np.random.choice(remaining_csms)
-        df.loc[df['account_id'] == account_id, 'new_csm'] = new_csm
-    cost = calculate_cost(df)
-    if cost[1] < best_cost[1]:
-        best_cost = cost
-        best_assignment = df['new_csm'].copy()
-
-# Apply the best assignment for red variance
-df['new_csm'] = best_assignment
-
-# Perform iterations for yellow variance
-for _ in range(100):
-    df['new_csm'] = df['new_csm_name']
-    for account_id in departing_accounts['account_id']:
-        new_csm = np.random.choice(remaining_csms)
-        df.loc[df['account_id'] == account_id, 'new_csm'] = new_csm
-    cost = calculate_cost(df)
-    if cost[2] < best_cost[2]:
-        best_cost = cost
-        best_assignment = df['new_csm'].copy()
-
-# Apply the best assignment for yellow variance
-df['new_csm'] = best_assignment
-
-# Perform iterations for green variance
-for _ in range(100):
-    df['new_csm'] = df['new_csm_name']
-    for account_id in departing_accounts['account_id']:
-        new_csm = np.random.choice(remaining_csms)
-        df.loc[df['account_id'] == account_id, 'new_csm'] = new_csm
-    cost = calculate_cost(df)
-    if cost[3] < best_cost[3]:
-        best_cost = cost
-        best_assignment = df['new_csm'].copy()
-
-# Apply the best assignment for green variance
-df['new_csm'] = best_assignment
+# Local search over the departing accounts instead of random sampling: every other account
+# stays put, moves and swaps are scored incrementally, and seeded restarts make it reproducible.
+# The notebook may run from backupfiles/ or elsewhere in the repo, so put the repo root
+# (the nearest directory holding csm_routing_automation.py) on the import path first
+import sys
+from pathlib import Path
+repo_root = next((path for path in [Path.cwd(), *Path.cwd().parents] if (path / 'csm_routing_automation.py').exists()), None)
+if repo_root is not None and str(repo_root) not in sys.path:
+    sys.path.insert(0, str(repo_root))
+from csm_routing_automation import local_search_redistribution, REDISTRIBUTION_HEALTH_SEGMENTS
+
+kept = df[df['new_csm_name'].isin(remaining_csms)]
+csm_col = {csm: col for col, csm in enumerate(remaining_csms)}
+kept_cols = kept['new_csm_name'].map(csm_col).to_numpy()
+health_cols = ['red_count', 'yellow_count', 'green_count']
+base_health = np.zeros((len(remaining_csms), 3))
+np.add.at(base_health, kept_cols, kept[health_cols].to_numpy())
+departing_health = departing_accounts['Health Segment'].map(
+    {segment: col for col, segment in enumerate(REDISTRIBUTION_HEALTH_SEGMENTS)}).fillna(-1).astype(int).to_numpy()
+
+results = [
+    local_search_redistribution(
+        np.bincount(kept_cols, minlength=len(remaining_csms)).astype(float),
+        np.bincount(kept_cols, weights=kept['Neediness Score'].fillna(0), minlength=len(remaining_csms)),
+        base_health,
+        departing_accounts['Neediness Score'].fillna(0).to_numpy(dtype=float),
+        departing_health,
+        np.full(len(remaining_csms), np.inf),
+        np.ones(4),
+        seed
+    )
+    for seed in range(8)
+]
+best_columns, _ = min(results, key=lambda result: result[1])
+
+df['new_csm'] = df['new_csm_name']
+df.loc[departing_accounts.index, 'new_csm'] = [remaining_csms[col] for col in best_columns]
+best_cost = calculate_cost(df)
 
 
 
@@ -19,10 +19,28 @@ import io
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.serialization import load_pem_private_key
 import time
+import os
 from typing import Dict, List, Tuple, Optional
 import copy
+import operator
+import hashlib
+import importlib.util
+import re
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import anthropic
 
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy is optional; batches then always use the PuLP MIP
+    linear_sum_assignment = None
+
+try:
+    from ortools.sat.python import cp_model
+except ImportError:  # OR-Tools is optional; the cpsat backend then falls back to CBC
+    cp_model = None
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -57,13 +75,383 @@ def convert_numpy_types(obj):
     else:
         return obj
 
+def compact_json(obj) -> str:
+    """Minified JSON for LLM payloads"""
+    return json.dumps(convert_numpy_types(obj), separators=(',', ':'), default=str)
+
+def compact_table(rows: list) -> str:
+    """Records as CSV (2 decimal places) - far fewer tokens than indented JSON for tabular data"""
+    if not rows:
+        return '(none)'
+    return pd.DataFrame(rows).round(2).to_csv(index=False).strip()
+
+# Issue severities from _identify_potential_issues, lowest first
+ISSUE_SEVERITY_LEVELS = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+
+# Decision used when an LLM review response cannot be parsed
+UNPARSED_REVIEW_RESULT = {
+    "approve": True,
+    "confidence_score": 0,
+    "feedback": "Could not parse LLM response, proceeding with assignments",
+    "critical_issues": [],
+    "warnings": ["LLM response parsing failed"],
+    "specific_reassignments": None,
+    "metrics_summary": {}
+}
+
+# Static part of the LLM review prompt: evaluation criteria, response schema and
+# reassignment rules. Sent as a cacheable system block ahead of the per-batch data.
+LLM_REVIEW_RUBRIC = """You are an expert CSM routing analyst. Conduct a thorough review of the account assignments in each request.
+
+## REVIEW DATA
+Each request contains these sections:
+- EXCLUDED CSMS: JSON list of CSMs with recent assignments. They should NOT be suggested as alternatives.
+- TOP ALTERNATIVE CSM OPTIONS: CSV of account_id, rank, csm, score, current_accounts, recent_24h and the red/yellow/green account counts of the alternative CSM's book. CSMs are ranked by optimization score (lower is better); rank 1 is always the CSM the optimizer assigned, ranks 2 and up are the alternatives. current_accounts is the CSM's book size before this batch. You should ONLY suggest changes if there's a significantly better alternative from this list. Choose from these alternatives to ensure diversity and avoid repeatedly assigning the same CSMs.
+- NEW ASSIGNMENTS DETAIL: CSV with one row per account and its attributes. The csm_ columns are the assigned CSM's current state (accounts, total and average neediness, revenue, assignments in the last 7 days, tenure).
+- PRE-ASSIGNMENT CSM BOOK ANALYSIS: CSV of book stats for the assigned and alternative CSMs, with the red_pct/yellow_pct/green_pct health mix before assignment.
+- POST-ASSIGNMENT PROJECTED METRICS: JSON team-wide balance metrics after the batch is assigned.
+- HEALTH SCORE DISTRIBUTION: CSV of the Red/Yellow/Green accounts each CSM receives in this batch.
+- HISTORICAL CSM PERFORMANCE: CSV of each CSM's assignments over the last 30 days.
+- IDENTIFIED CONCERNS: JSON list of rule-based issues with type, severity and detail.
+
+## SPECIFIC EVALUATION CRITERIA:
+
+1. **Workload Balance** (Critical):
+   - Is the standard deviation of account counts > 20% of mean?
+   - Are any CSMs getting > 3 accounts in this batch?
+   - Will any CSM exceed their maximum capacity (from config)?
+
+2. **CSM Tenure & Experience Matching** (Critical):
+   - Are Red accounts going to experienced CSMs (Senior/Expert)?
+   - Are new CSMs (<3 months) receiving appropriate accounts (preferably Green)?
+   - Are high neediness accounts (score >= 8) assigned to CSMs with 6+ months tenure?
+   - Is any new CSM getting more than 2 accounts in this batch?
+
+3. **Health Score Color Matching** (High Priority):
+   - Red accounts should go to CSMs with tenure >= 12 months
+   - Green accounts can go to newer CSMs for development
+   - Yellow accounts need balanced distribution
+   - No CSM should have > 35% Red accounts after assignment
+
+4. **Neediness Distribution** (High Priority):
+   - High neediness accounts (score >= 8) should go to Senior/Expert CSMs
+   - Is the neediness variance increasing by > 30%?
+   - Are junior CSMs protected from getting multiple high neediness accounts?
+
+5. **Batch Assignment Logic** (High Priority for Multi-Account):
+   - Evaluate the collective impact of all accounts in the batch
+   - Check if any single CSM is receiving too many accounts (max 3 per batch)
+   - Ensure batch doesn't overload new/junior CSMs
+   - Verify health score mix in batch is appropriate for each CSM's experience
+
+6. **Revenue Distribution** (Medium Priority):
+   - High-value accounts ($100k+) should go to experienced CSMs
+   - Are enterprise accounts being assigned to CSMs with 12+ months tenure?
+
+7. **Recent Assignment Pattern** (Medium Priority):
+   - Has any CSM received > 5 assignments in last 7 days?
+   - Are new CSMs (<3 months) getting > 2 assignments in 24 hours?
+   - Cooling period more important for junior CSMs
+
+8. **Special Considerations**:
+   - Parent/child account relationships maintained?
+   - Industry expertise matched where applicable?
+   - Timezone alignment considered?
+
+## YOUR TASK:
+1. Analyze each criterion systematically
+2. Identify SPECIFIC problems (not general observations)
+3. Only disapprove if there are SIGNIFICANT imbalances that would harm customer experience
+4. Consider cumulative effect of assignments, not just individual ones
+
+Respond with a JSON object:
+{
+    "approve": true/false,
+    "confidence_score": 0-100 (how confident you are in this decision),
+    "feedback": "Specific 1-2 sentence explanation of your decision",
+    "critical_issues": ["List of critical problems requiring immediate rebalancing"],
+    "warnings": ["List of non-critical concerns to monitor"],
+    "specific_reassignments": {"account_id": "suggested_csm"} or null,  // IMPORTANT: You MUST select from the TOP ALTERNATIVE CSM OPTIONS provided in the request! Pick a rank 2-5 alternative (rank 1 is the current assignment) to ensure diversity. Do NOT suggest any CSM from the EXCLUDED CSMS list!
+    "metrics_summary": {
+        "workload_balance": "good/fair/poor",
+        "neediness_distribution": "good/fair/poor",
+        "health_balance": "good/fair/poor",
+        "overall_quality": "good/fair/poor"
+    }
+}
+
+CRITICAL RULES FOR REASSIGNMENTS:
+1. You MUST ONLY suggest CSMs from the "TOP ALTERNATIVE CSM OPTIONS" section of the request
+2. Rank 1 is the current assignment; suggest a rank 2, 3, or 4 alternative to ensure diversity
+3. If the same CSM is rank 1 for multiple accounts, distribute to alternatives
+4. NEVER suggest CSMs from the EXCLUDED CSMS list
+5. If no good alternative exists in the top 5, approve the original assignment
+
+Be specific and actionable. Default to approval unless there are clear, significant problems."""
+
+# Version of the review payload compilation (sections, columns, reductions). Bump it when
+# compile_review_payload changes what the LLM sees so cached review decisions are not reused
+LLM_REVIEW_PROMPT_VERSION = 1
+
+# Rough characters per token, used until a prompt has been measured with the token counting API
+LLM_CHARS_PER_TOKEN = 4
+
+# MIP backends for the batch model. CBC ships with PuLP; HiGHS needs highspy and
+# CP-SAT needs ortools. Unavailable backends fall back to CBC.
+BATCH_SOLVER_BACKENDS = ('cbc', 'highs', 'cpsat')
+
+# CP-SAT only takes integer models: continuous variables are expressed in 1/1000 units
+# and constraint/objective coefficients are scaled and rounded to integers
+CPSAT_CONTINUOUS_SCALE = 1000
+CPSAT_COEFFICIENT_SCALE = 1000
+CPSAT_OBJECTIVE_SCALE = 100000
+CPSAT_DEFAULT_BOUND = 10 ** 9
+
+# Comparison operators available to scoring rule conditions. Each works on scalars
+# (account fields) and on NumPy arrays (candidate CSM fields).
+# Module-level functions (not lambdas) keep compiled rules picklable for worker processes.
+def not_in_values(values, target):
+    """Elementwise negation of np.isin"""
+    return ~np.isin(values, target)
+
+SCORING_RULE_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    'in': np.isin,
+    'not_in': not_in_values
+}
+
+def compile_scoring_rules(spec: Dict) -> Dict:
+    """
+    Compile a scoring rule specification (see csm_scoring_rules.json) into condition
+    tuples and penalty terms that evaluate over all candidate CSMs at once.
+    Done once at startup so the per-account cost is a handful of array operations.
+    """
+    def compile_conditions(conditions):
+        compiled = []
+        for condition in conditions or []:
+            op = condition['op']
+            if op not in SCORING_RULE_OPERATORS:
+                raise ValueError(f"Unknown scoring rule operator '{op}' for field '{condition['field']}'")
+            compiled.append((condition['field'], SCORING_RULE_OPERATORS[op], condition['value']))
+        return compiled
+
+    rules = []
+    rule_components = []
+    for rule in spec.get('rules', []):
+        component = rule['component']
+        if component not in rule_components:
+            rule_components.append(component)
+        rules.append({
+            'name': rule['name'],
+            'component': component,
+            'account': compile_conditions(rule.get('account')),
+            'csm': compile_conditions(rule.get('csm')),
+            'penalty': float(rule['penalty'])
+        })
+
+    recency = dict(spec.get('recency', {}))
+    recency['tenure_multipliers'] = [
+        {'when': compile_conditions(tier['when']), 'multiplier': float(tier['multiplier'])}
+        for tier in recency.get('tenure_multipliers', [])
+    ]
+
+    return {
+        'balance_weights': spec.get('balance_weights', {}),
+        # Tiers are first-match from the highest threshold down
+        'capacity_tiers': sorted(spec.get('capacity_tiers', []), key=lambda tier: tier['accounts_below_max']),
+        'recency': recency,
+        'account_defaults': spec.get('account_defaults', {}),
+        'rules': rules,
+        'rule_components': rule_components,
+        'batch_objective_weights': spec.get('batch_objective_weights', {}),
+        # LLM review model settings and prompt token budget
+        'llm_review': spec.get('llm_review', {}),
+        # Full-book rebalancing: objective weights, balance bands and solver settings
+        'rebalancing': spec.get('rebalancing', {}),
+        # Per-candidate score breakdown files: enabled flag and output directory
+        'score_audit': spec.get('score_audit', {}),
+        # auto | mip | assignment - auto picks the assignment engine when it is exact
+        'batch_engine': spec.get('batch_solver', {}).get('engine', 'auto'),
+        # cbc | highs | cpsat - tiers may override the backend per batch size
+        'batch_backend': spec.get('batch_solver', {}).get('backend', 'cbc'),
+        # CSM columns kept per account in the MIP (null/0 = keep every eligible CSM)
+        'batch_candidate_pool_size': spec.get('batch_solver', {}).get('candidate_pool_size'),
+        # binary (one column per account) | aggregated (integer counts per account class)
+        'batch_formulation': spec.get('batch_solver', {}).get('formulation', 'binary'),
+        # Backlogs larger than chunk_size (or than the eligible CSM pool) are solved in ordered chunks
+        'rolling_horizon': spec.get('batch_solver', {}).get('rolling_horizon', {}),
+        # Solver tiers are matched by the smallest max_batch_size that fits (null = no limit)
+        'batch_solver_tiers': sorted(
+            spec.get('batch_solver', {}).get('tiers', []),
+            key=lambda tier: float('inf') if tier.get('max_batch_size') is None else tier['max_batch_size']
+        )
+    }
+
+def merge_scoring_spec(base: Dict, overrides: Dict) -> Dict:
+    """Scoring spec with overrides applied: nested objects are merged, other values replaced"""
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_scoring_spec(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+# Health colours balanced by the departing-book redistribution, in metric column order
+REDISTRIBUTION_HEALTH_SEGMENTS = ['Red', 'Yellow', 'Green']
+
+def local_search_redistribution(base_counts: np.ndarray, base_neediness: np.ndarray, base_health: np.ndarray,
+                                account_neediness: np.ndarray, account_health: np.ndarray, capacity: np.ndarray,
+                                weights: np.ndarray, seed: int, max_passes: int = 50) -> Tuple[np.ndarray, float]:
+    """
+    Redistribute movable accounts over K CSMs by randomized greedy construction followed
+    by move and swap local search. The objective is the weighted population variance across
+    CSMs of [mean neediness, red count, yellow count, green count]. Per-CSM aggregates and
+    the running sum and sum of squares of each metric are kept, so a move or swap is scored
+    in O(1) from the two CSMs it touches; each account's moves (over all CSMs) and swaps
+    (over all other accounts) are scored as one array. An account that finds every CSM at
+    capacity during construction is left unassigned (column -1) with a warning.
+    Module-level so worker processes can run restarts.
+
+    Args:
+        base_counts, base_neediness: Accounts and total neediness each CSM keeps, shape (K,)
+        base_health: Red/yellow/green counts each CSM keeps, shape (K, 3)
+        account_neediness: Neediness of each movable account, shape (M,)
+        account_health: Health column (0-2) of each movable account, -1 when unknown
+        capacity: Maximum accounts per CSM, shape (K,)
+        weights: Objective weight per metric, shape (4,)
+        seed: Seed for the construction order and tie breaking
+
+    Returns: (CSM column per movable account or -1, objective over the assigned accounts)
+    """
+    rng = np.random.default_rng(seed)
+    num_csms = len(base_counts)
+    counts = base_counts.astype(float).copy()
+    neediness = base_neediness.astype(float).copy()
+    metrics = np.zeros((num_csms, 4))
+    metrics[:, 0] = np.divide(neediness, counts, out=np.zeros(num_csms), where=counts > 0)
+    metrics[:, 1:] = base_health
+    totals = metrics.sum(axis=0)
+    squares = (metrics ** 2).sum(axis=0)
+
+    def objective_delta(d_total, d_square):
+        return (weights * (d_square / num_csms - ((totals + d_total) ** 2 - totals ** 2) / num_csms ** 2)).sum(axis=-1)
+
+    def apply(csm, d_count, d_neediness, health_col, d_health):
+        nonlocal totals, squares
+        old = metrics[csm].copy()
+        counts[csm] += d_count
+        neediness[csm] += d_neediness
+        metrics[csm, 0] = neediness[csm] / counts[csm] if counts[csm] > 0 else 0.0
+        if health_col >= 0:
+            metrics[csm, 1 + health_col] += d_health
+        totals = totals + metrics[csm] - old
+        squares = squares + metrics[csm] ** 2 - old ** 2
+
+    def arrival_metrics(value, health_col):
+        arrived = metrics.copy()
+        arrived[:, 0] = (neediness + value) / (counts + 1)
+        if health_col >= 0:
+            arrived[:, 1 + health_col] += 1
+        return arrived
+
+    num_accounts = len(account_neediness)
+    columns = np.full(num_accounts, -1, dtype=int)
+
+    # Randomized greedy construction: random order, cheapest CSM with capacity (random tie break)
+    for account in rng.permutation(num_accounts):
+        value, health_col = account_neediness[account], account_health[account]
+        open_csms = counts < capacity
+        if not open_csms.any():
+            continue
+        arrived = arrival_metrics(value, health_col)
+        deltas = objective_delta(arrived - metrics, arrived ** 2 - metrics ** 2)
+        deltas[~open_csms] = np.inf
+        best = np.flatnonzero(deltas <= deltas.min() + 1e-12)
+        column = int(rng.choice(best))
+        columns[account] = column
+        apply(column, 1, value, health_col, 1)
+
+    unassigned = int((columns < 0).sum())
+    if unassigned:
+        logger.warning(f"Every CSM is at capacity - {unassigned} of {num_accounts} accounts left unassigned")
+    placed = np.flatnonzero(columns >= 0)
+
+    for _ in range(max_passes):
+        improved = False
+
+        # Move pass: best relocation of each account, scored against every CSM at once
+        for account in rng.permutation(placed):
+            source, value, health_col = columns[account], account_neediness[account], account_health[account]
+            left = metrics[source].copy()
+            left[0] = (neediness[source] - value) / (counts[source] - 1) if counts[source] > 1 else 0.0
+            if health_col >= 0:
+                left[1 + health_col] -= 1
+            arrived = arrival_metrics(value, health_col)
+            deltas = objective_delta(left - metrics[source] + arrived - metrics,
+                                     left ** 2 - metrics[source] ** 2 + arrived ** 2 - metrics ** 2)
+            deltas[counts >= capacity] = np.inf
+            deltas[source] = 0.0
+            target = int(np.argmin(deltas))
+            if deltas[target] < -1e-9:
+                apply(source, -1, -value, health_col, -1)
+                apply(target, 1, value, health_col, 1)
+                columns[account] = target
+                improved = True
+
+        # Swap pass: best exchange of each account with an account on another CSM, scored
+        # against every partner at once (counts, so capacity, are unchanged)
+        partner_values, partner_health = account_neediness[placed], account_health[placed]
+        partner_known = np.flatnonzero(partner_health >= 0)
+        for first in rng.permutation(placed):
+            a_col, a_value, a_health = columns[first], account_neediness[first], account_health[first]
+            b_cols = columns[placed]
+            a_new = np.tile(metrics[a_col], (len(placed), 1))
+            b_new = metrics[b_cols].copy()
+            a_new[:, 0] += (partner_values - a_value) / counts[a_col]
+            b_new[:, 0] += (a_value - partner_values) / counts[b_cols]
+            if a_health >= 0:
+                a_new[:, 1 + a_health] -= 1
+                b_new[:, 1 + a_health] += 1
+            a_new[partner_known, 1 + partner_health[partner_known]] += 1
+            b_new[partner_known, 1 + partner_health[partner_known]] -= 1
+            deltas = objective_delta(a_new - metrics[a_col] + b_new - metrics[b_cols],
+                                     a_new ** 2 - metrics[a_col] ** 2 + b_new ** 2 - metrics[b_cols] ** 2)
+            deltas[(b_cols == a_col) | ((partner_values == a_value) & (partner_health == a_health))] = np.inf
+            best = int(np.argmin(deltas))
+            if deltas[best] < -1e-9:
+                second, b_col = placed[best], b_cols[best]
+                b_value, b_health = account_neediness[second], account_health[second]
+                apply(a_col, 0, b_value - a_value, a_health, -1)
+                apply(a_col, 0, 0.0, b_health, 1)
+                apply(b_col, 0, a_value - b_value, a_health, 1)
+                apply(b_col, 0, 0.0, b_health, -1)
+                columns[first], columns[second] = b_col, a_col
+                improved = True
+
+        if not improved:
+            break
+
+    # Recompute the objective from the final aggregates so incremental drift never leaks out
+    objective = float((weights * metrics.var(axis=0)).sum())
+    return columns, objective
+
 class CSMRoutingAutomation:
     """Main class for CSM routing automation"""
 
-    def __init__(self, config_file='properties.json', limits_file='csm_category_limits.json'):
+    def __init__(self, config_file='properties.json', limits_file='csm_category_limits.json',
+                 rules_file='csm_scoring_rules.json'):
         """Initialize the automation with configuration"""
         self.config = self.load_config(config_file)
         self.limits = self.load_config(limits_file)
+        # Scoring policy shared by single-account routing and the batch objective
+        self.scoring_spec = self.load_config(rules_file)
+        self.scoring_rules = compile_scoring_rules(self.scoring_spec)
         self.snowflake_conn = None
         self.eligible_csm_list = []  # Will be populated from database
         self.assignment_history = []  # Track assignments in this session
@@ -83,6 +471,29 @@ class CSMRoutingAutomation:
         self.neediness_cache = None
         self.cache_timestamp = None
 
+        # Raw Residential Corporate book accounts sorted by CSM, stored before the manager,
+        # Workday and minimum-threshold filters - books only hold aggregates. Rebalancing and
+        # redistribution read accounts from it; rosters come from eligible_csm_list, never this frame
+        self.csm_book_frame = None
+
+        # Run-scoped cache of per-CSM health distributions - reset at the start of each run
+        self.health_distribution_cache = None
+
+        # Array-backed (candidate x component) score capture for the current run
+        self.score_audit = None
+
+        # Status, objective, gap and timing of the most recent batch solve
+        self.last_solve_stats = None
+
+        # Backend, status and timing of every batch solve in this process
+        self.solve_history = []
+
+        # Token usage and prompt cache hits of every LLM review call in this process
+        self.review_usage_history = []
+
+        # Token count of the static review rubric, measured on first use
+        self.review_rubric_tokens = None
+
     def populate_neediness_cache(self):
         """
         Run the neediness query ONCE for ALL accounts and cache results.
@@ -145,6 +556,14 @@ class CSMRoutingAutomation:
             self.neediness_cache = pd.DataFrame()  # Use empty DataFrame as fallback
             return False
 
+    def __getstate__(self):
+        """Drop live connections and clients so the router can be sent to worker processes"""
+        state = self.__dict__.copy()
+        state['snowflake_conn'] = None
+        state['claude_client'] = None
+        state['score_audit'] = None
+        return state
+
     def load_config(self, filepath):
         """Load configuration from JSON file"""
         with open(filepath) as file:
@@ -584,25 +1003,40 @@ class CSMRoutingAutomation:
         total_csms_before = df['csm_name'].nunique()
         logger.info(f"CSMs with Residential Corporate accounts: {total_csms_before}")
 
+        # Sort once by CSM so every book is a contiguous row range of the frame. The frame is kept
+        # unfiltered (managers and inactive CSMs included) - the eligible roster is eligible_csm_list
+        df = df.sort_values('csm_name', kind='stable').reset_index(drop=True)
+        self.csm_book_frame = df
+        sorted_names = df['csm_name'].to_numpy()
+        range_starts = np.concatenate(([0], np.flatnonzero(sorted_names[1:] != sorted_names[:-1]) + 1))
+        range_stops = np.append(range_starts[1:], len(df))
+        csm_names = sorted_names[range_starts]
+
+        # TOTAL account count across ALL segments for capacity checking, computed in one pass
+        total_account_counts = all_accounts_df.groupby('responsible_csm')['account_id'].nunique().to_dict()
+
+        managers_to_exclude_set = set(managers_to_exclude)
+        active_csms_workday_set = set(active_csms_workday)
+
         # Group by CSM to create book structure
         # Only include CSMs who are both:
         # 1. Active in Workday
         # 2. Not managers
         # 3. Have current book assignments for Residential Corporate
         csm_books = {}
-        for csm in df['csm_name'].unique():
+        for csm, start, stop in zip(csm_names, range_starts, range_stops):
             # Skip if CSM is a manager or not active in Workday
-            if csm and csm not in managers_to_exclude:
+            if csm and csm not in managers_to_exclude_set:
                 # IMPORTANT: Only include CSMs who are active in Workday
                 # This ensures we don't assign to CSMs who have left the company
-                if active_csms_workday and csm not in active_csms_workday:
+                if active_csms_workday_set and csm not in active_csms_workday_set:
                     logger.warning(f"CSM {csm} has assignments but not found in active Workday CSMs - skipping")
                     continue
 
-                csm_df = df[df['csm_name'] == csm]
+                csm_df = df.iloc[start:stop]
 
                 # Get TOTAL account count across ALL segments for capacity checking
-                total_accounts = all_accounts_df[all_accounts_df['responsible_csm'] == csm]['account_id'].nunique()
+                total_accounts = total_account_counts.get(csm, 0)
 
                 # Get health segment distribution (for Residential Corporate only)
                 health_dist = csm_df['health_segment'].value_counts().to_dict() if 'health_segment' in csm_df.columns else {}
@@ -615,7 +1049,6 @@ class CSMRoutingAutomation:
                 })
 
                 csm_books[csm] = {
-                    'accounts': csm_df.to_dict('records'),
                     'count': total_accounts,  # Use TOTAL count for capacity checking
                     'resi_corp_count': len(csm_df),  # Keep segment-specific count for reference
                     'total_neediness': csm_df['neediness_score'].fillna(0).sum() if 'neediness_score' in csm_df.columns else len(csm_df) * 5,
@@ -710,16 +1143,40 @@ class CSMRoutingAutomation:
 
     def get_recent_csm_recommendations(self, csm_name: str, hours: int = 4) -> Dict:
         """Get recent recommendations AND actual assignments for a CSM from the database"""
+        return self.get_recent_recommendations_for_csms([csm_name], hours)[csm_name]
+
+    def get_recent_recommendations_for_csms(self, csm_list: list, hours: int = 4) -> Dict:
+        """
+        Recent recommendations AND actual assignments for several CSMs with one grouped query.
+        Returns {csm: stats} with the same keys for every CSM, zeros when nothing was found.
+        """
+        recent = {
+            csm: {
+                'total_recommendations': 0,
+                'last_1_hour': 0,
+                'last_4_hours': 0,
+                'last_24_hours': 0,
+                'most_recent_recommendation': None,
+                'avg_neediness_assigned': 0,
+                'actual_assignments': 0
+            }
+            for csm in dict.fromkeys(csm_list)
+        }
+        if not recent:
+            return recent
+
         # CRITICAL FIX: Check BOTH recommendations AND actual assignments
+        csm_names_str = "', '".join(recent)
         query = f"""
         WITH all_assignments AS (
             -- Get recommendations from recommendations table
             SELECT
+                recommended_csm as csm_name,
                 recommendation_timestamp as timestamp,
                 neediness_score,
                 'recommendation' as source_type
             FROM {self.recommendations_table}
-            WHERE recommended_csm = '{csm_name}'
+            WHERE recommended_csm IN ('{csm_names_str}')
                 AND recommendation_timestamp >= DATEADD(hour, -{hours}, CURRENT_TIMESTAMP())
 
             UNION ALL
@@ -727,14 +1184,16 @@ class CSMRoutingAutomation:
             -- ALSO get actual assignments from assignments table
             -- Note: assignments table doesn't have neediness_score
             SELECT
+                csm_name,
                 assignment_date as timestamp,
                 NULL as neediness_score,  -- assignments table doesn't have this column
                 'assignment' as source_type
             FROM {self.assignments_table}
-            WHERE csm_name = '{csm_name}'
+            WHERE csm_name IN ('{csm_names_str}')
                 AND assignment_date >= DATEADD(hour, -{hours}, CURRENT_TIMESTAMP())
         )
         SELECT
+            csm_name,
             COUNT(*) as total_recommendations,
             COUNT(CASE WHEN timestamp >= DATEADD(hour, -1, CURRENT_TIMESTAMP()) THEN 1 END) as last_1_hour,
             COUNT(CASE WHEN timestamp >= DATEADD(hour, -4, CURRENT_TIMESTAMP()) THEN 1 END) as last_4_hours,
@@ -743,6 +1202,7 @@ class CSMRoutingAutomation:
             AVG(neediness_score) as avg_neediness_assigned,  -- will be NULL-aware average
             SUM(CASE WHEN source_type = 'assignment' THEN 1 ELSE 0 END) as actual_assignments
         FROM all_assignments
+        GROUP BY csm_name
         """
 
         try:
@@ -750,28 +1210,68 @@ class CSMRoutingAutomation:
             if not df.empty:
                 # Standardize column names to lowercase
                 df.columns = [col.lower() for col in df.columns]
-                return df.iloc[0].to_dict()
-            else:
-                return {
-                    'total_recommendations': 0,
-                    'last_1_hour': 0,
-                    'last_4_hours': 0,
-                    'last_24_hours': 0,
-                    'most_recent_recommendation': None,
-                    'avg_neediness_assigned': 0,
-                    'actual_assignments': 0
-                }
+                for row in df.to_dict('records'):
+                    csm = row.pop('csm_name')
+                    if csm in recent:
+                        recent[csm].update(row)
         except Exception as e:
-            logger.error(f"Failed to get recent recommendations for {csm_name}: {str(e)}")
-            return {
-                'total_recommendations': 0,
-                'last_1_hour': 0,
-                'last_4_hours': 0,
-                'last_24_hours': 0
-            }
+            logger.error(f"Failed to get recent recommendations for {len(recent)} CSMs: {str(e)}")
+
+        return recent
+
+    def cache_all_csm_health_distributions(self, csm_list: list) -> Dict:
+        """
+        Bulk fetch health distributions for all CSMs with one grouped query.
+        Results are kept for the rest of the run so per-CSM lookups don't hit the warehouse.
+        Falls back to the neediness cache if the warehouse returns nothing.
+        """
+        if self.health_distribution_cache is None:
+            self.health_distribution_cache = {}
+
+        missing_csms = [csm for csm in dict.fromkeys(csm_list) if csm not in self.health_distribution_cache]
+        if missing_csms:
+            logger.info(f"Bulk fetching health distributions for {len(missing_csms)} CSMs...")
+            csm_names_str = "', '".join(missing_csms)
+            query = f"""
+            SELECT
+                responsible_csm_name as csm_name,
+                CORE_HEALTH_SCORE_COLOR as health_segment,
+                COUNT(*) as count
+            FROM DSV_WAREHOUSE.POST_SALES.VW_CUSTOMER_HISTORY_DAILY
+            WHERE responsible_csm_name IN ('{csm_names_str}')
+                AND is_current = TRUE
+                AND is_customer = TRUE
+            GROUP BY responsible_csm_name, CORE_HEALTH_SCORE_COLOR
+            """
+
+            df = self.execute_query(query)
+            if not df.empty:
+                df.columns = [col.lower() for col in df.columns]
+            elif self.neediness_cache is not None and not self.neediness_cache.empty \
+                    and {'responsible_csm', 'health_segment'}.issubset(self.neediness_cache.columns):
+                logger.warning("No health distribution rows from warehouse - deriving from neediness cache")
+                cached = self.neediness_cache[self.neediness_cache['responsible_csm'].isin(missing_csms)]
+                df = cached.groupby(['responsible_csm', 'health_segment']).size().reset_index(name='count')
+                df = df.rename(columns={'responsible_csm': 'csm_name'})
+
+            for csm in missing_csms:
+                self.health_distribution_cache[csm] = {'Red': 0, 'Yellow': 0, 'Green': 0, 'total': 0}
+
+            if not df.empty:
+                for csm, group in df.groupby('csm_name'):
+                    distribution = group.set_index('health_segment')['count'].to_dict()
+                    distribution['total'] = sum(distribution.values())
+                    self.health_distribution_cache[csm] = distribution
+
+            logger.info(f"Cached health distributions for {len(self.health_distribution_cache)} CSMs")
+
+        return {csm: self.health_distribution_cache[csm] for csm in csm_list}
 
     def get_csm_health_distribution(self, csm_name: str) -> Dict:
         """Get the distribution of health scores for a CSM's current book"""
+        if self.health_distribution_cache and csm_name in self.health_distribution_cache:
+            return self.health_distribution_cache[csm_name]
+
         query = f"""
         SELECT
             CORE_HEALTH_SCORE_COLOR as health_segment,
@@ -1081,48 +1581,14 @@ class CSMRoutingAutomation:
         """
         Calculate penalty based on how recently CSM received recommendations from the database
         Returns higher penalty for more recent/frequent recommendations
-        Uses exponential scaling to strongly discourage repeated assignments
+        Uses exponential scaling (from the recency section of the scoring rules) to strongly
+        discourage repeated assignments
         Can use cached data if provided to avoid repeated queries
         """
-        # Use cached data if available, otherwise query database
-        if recency_data and csm_name in recency_data:
-            recent_data = recency_data[csm_name]
-        else:
-            recent_data = self.get_recent_csm_recommendations(csm_name, 24)
-
-        # Calculate weighted penalty with exponential scaling
-        penalty = 0
-
-        # EXTREME exponential penalty for very recent recommendations (last hour)
-        if recent_data['last_1_hour'] > 0:
-            # Massive penalty: 1M for 1, 4M for 2, 9M for 3, etc.
-            penalty += 1000000 * (recent_data['last_1_hour'] ** 2)
-
-        # Very heavy penalty for recommendations in last 4 hours
-        last_4_hours_excluding_1 = recent_data['last_4_hours'] - recent_data['last_1_hour']
-        if last_4_hours_excluding_1 > 0:
-            # Heavy penalty: 100K for 1, 400K for 2, 900K for 3, etc.
-            penalty += 100000 * (last_4_hours_excluding_1 ** 2)
-
-        # Heavy penalty for recommendations in last 24 hours
-        last_24_hours_excluding_4 = recent_data['last_24_hours'] - recent_data['last_4_hours']
-        if last_24_hours_excluding_4 > 0:
-            # Strong penalty: 10K for 1, 40K for 2, 90K for 3, 160K for 4, etc.
-            penalty += 10000 * (last_24_hours_excluding_4 ** 2)
-
-        # Additional penalty based on total recent assignments (7 days)
-        recent_7d = recent_data.get('recent_assignments_7d', 0)
-        if recent_7d > 5:
-            # Strong penalty for CSMs with many assignments in past week
-            penalty += 50 * (recent_7d - 5)  # 50 penalty per assignment over 5
-
-        # Additional penalty if CSM has high average neediness score assignments
-        avg_neediness = recent_data.get('avg_neediness_assigned')
-        if avg_neediness and avg_neediness > 7:
-            penalty += 50  # Increased penalty if CSM is getting high neediness accounts
+        penalty = float(self.calculate_recency_penalties([csm_name], recency_data)[0])
 
         # Log the penalty calculation for debugging
-        logger.debug(f"Recency penalty for {csm_name}: {penalty} (1hr:{recent_data['last_1_hour']}, 4hr:{last_4_hours_excluding_1}, 24hr:{last_24_hours_excluding_4}, 7d:{recent_7d})")
+        logger.debug(f"Recency penalty for {csm_name}: {penalty}")
 
         return penalty
 
@@ -1152,187 +1618,455 @@ class CSMRoutingAutomation:
             'tad_std': np.std(metrics['tad'])
         }
 
-    def assign_single_account_optimized(self, account: pd.Series, csm_books: Dict, excluded_csms: list = None) -> Tuple[str, float, list]:
+    def calculate_book_moments(self, csm_books: Dict) -> Dict:
+        """
+        Running sums and sums of squares for each balance metric across all CSM books.
+        Values are shifted by their mean so the variance stays numerically stable for
+        large revenue totals. Used to score candidate assignments without copying books.
+        """
+        num_books = len(csm_books)
+        moments = {'n': num_books}
+
+        for field in ('count', 'total_neediness', 'total_revenue', 'total_tad'):
+            values = np.fromiter((book[field] for book in csm_books.values()), dtype=float, count=num_books)
+            shift = values.mean() if num_books else 0.0
+            deviations = values - shift
+            moments[field] = {
+                'shift': shift,
+                'sum': deviations.sum(),
+                'sum_sq': np.square(deviations).sum()
+            }
+
+        return moments
+
+    def variance_after_increment(self, moments: Dict, field: str, current_value: float, delta: float) -> float:
+        """
+        Population variance of a book metric after adding delta to one CSM's value.
+        O(1) equivalent of recomputing np.var over every book.
+        """
+        num_books = moments['n']
+        if num_books == 0:
+            return 0.0
+
+        field_moments = moments[field]
+        deviation = current_value - field_moments['shift']
+        total = field_moments['sum'] + delta
+        total_sq = field_moments['sum_sq'] + 2 * deviation * delta + delta * delta
+        mean = total / num_books
+        return max(total_sq / num_books - mean * mean, 0.0)
+
+    def calculate_recency_penalties(self, csm_list: list, recency_data: Dict = None) -> np.ndarray:
+        """
+        Base recency penalty for each CSM in csm_list, evaluated as arrays.
+        CSMs missing from recency_data fall back to a per-CSM database lookup.
+        """
+        recency_rules = self.scoring_rules['recency']
+        recency_data = recency_data or {}
+        rows = [
+            recency_data[csm] if csm in recency_data else self.get_recent_csm_recommendations(csm, 24)
+            for csm in csm_list
+        ]
+
+        def column(key):
+            return np.array([row.get(key, 0) or 0 for row in rows], dtype=float)
+
+        penalty = np.zeros(len(rows))
+
+        # Exponential penalties per time window, each window excluding the narrower one
+        for tier in recency_rules.get('window_penalties', []):
+            window_counts = column(tier['window'])
+            if tier.get('exclude'):
+                window_counts = window_counts - column(tier['exclude'])
+            window_counts = np.maximum(window_counts, 0)
+            penalty += tier['penalty'] * window_counts ** tier.get('power', 1)
+
+        # Additional penalty based on total recent assignments (7 days)
+        recent_7d = column('recent_assignments_7d')
+        penalty += recency_rules.get('weekly_penalty_per_assignment', 0) * np.maximum(
+            recent_7d - recency_rules.get('weekly_threshold', 0), 0
+        )
+
+        # Additional penalty if CSM has high average neediness score assignments
+        avg_neediness = column('avg_neediness_assigned')
+        penalty += np.where(
+            avg_neediness > recency_rules.get('avg_neediness_threshold', np.inf),
+            recency_rules.get('avg_neediness_penalty', 0), 0
+        )
+
+        return penalty
+
+    def build_candidate_arrays(self, csm_books: Dict, candidates: list, recency_cache: Dict) -> Dict:
+        """Gather the per-CSM inputs of the scoring kernel into aligned NumPy arrays"""
+        books = [csm_books[csm] for csm in candidates]
+        health = [book.get('health_distribution', {}) for book in books]
+        health_totals = np.array([max(dist.get('total', 1), 1) for dist in health], dtype=float)
+        recency = [recency_cache.get(csm, {}) for csm in candidates]
+
+        return {
+            'csms': np.array(candidates, dtype=object),
+            'count': np.array([book['count'] for book in books], dtype=float),
+            'total_neediness': np.array([book['total_neediness'] for book in books], dtype=float),
+            'total_revenue': np.array([book['total_revenue'] for book in books], dtype=float),
+            'total_tad': np.array([book['total_tad'] for book in books], dtype=float),
+            'red_pct': np.array([dist.get('Red', 0) for dist in health], dtype=float) / health_totals,
+            'yellow_pct': np.array([dist.get('Yellow', 0) for dist in health], dtype=float) / health_totals,
+            'green_pct': np.array([dist.get('Green', 0) for dist in health], dtype=float) / health_totals,
+            'tenure_months': np.array([book.get('tenure_months', 6) for book in books], dtype=float),
+            'tenure_category': np.array([book.get('tenure_category', 'Mid') for book in books], dtype=object),
+            'last_24_hours': np.array([row.get('last_24_hours', 0) or 0 for row in recency], dtype=float),
+            'avg_neediness_assigned': np.array(
+                [row.get('avg_neediness_assigned') if row.get('avg_neediness_assigned') is not None else np.nan
+                 for row in recency], dtype=float),
+            'recency_base': self.calculate_recency_penalties(candidates, recency_cache)
+        }
+
+    def rule_conditions_mask(self, conditions: list, candidate_arrays: Dict) -> np.ndarray:
+        """Boolean mask of the candidates that satisfy every compiled condition"""
+        mask = np.ones(len(candidate_arrays['csms']), dtype=bool)
+        for field, op, target in conditions:
+            mask &= np.asarray(op(candidate_arrays[field], target), dtype=bool)
+        return mask
+
+    def account_matches_rule(self, conditions: list, account: pd.Series) -> bool:
+        """Whether an account satisfies every compiled condition (missing fields use the rule defaults)"""
+        defaults = self.scoring_rules['account_defaults']
+        return all(
+            bool(op(account.get(field, defaults.get(field)), target))
+            for field, op, target in conditions
+        )
+
+    def calculate_rule_penalties(self, account: pd.Series, candidate_arrays: Dict) -> Dict:
+        """
+        Evaluate the compiled scoring rules for one account against every candidate.
+        Returns one penalty array per component: capacity, recency and each rule component.
+        """
+        rules = self.scoring_rules
+        counts = candidate_arrays['count']
+        tenure_months = candidate_arrays['tenure_months']
+
+        # STRONG penalty for high account counts (scaled to match variance magnitudes)
+        max_accounts = self.limits.get('residential_corporate', {}).get('max_accounts_per_csm', 105)
+        tiers = rules['capacity_tiers']
+        capacity = np.select(
+            [counts >= max_accounts - tier['accounts_below_max'] for tier in tiers],
+            [(counts - (max_accounts - tier['accounts_below_max'] - 1)) * tier['penalty_per_account'] for tier in tiers],
+            default=0.0
+        ) if tiers else np.zeros(len(counts))
+
+        components = {'capacity': capacity}
+        for component in rules['rule_components']:
+            components[component] = np.zeros(len(counts))
+
+        # Health color, tenure and neediness rules
+        for rule in rules['rules']:
+            if self.account_matches_rule(rule['account'], account):
+                components[rule['component']] += rule['penalty'] * self.rule_conditions_mask(rule['csm'], candidate_arrays)
+
+        # Recency penalty scaled, then adjusted for tenure (first matching tier)
+        recency_rules = rules['recency']
+        multiplier_tiers = recency_rules.get('tenure_multipliers', [])
+        tenure_multiplier = np.select(
+            [self.rule_conditions_mask(tier['when'], candidate_arrays) for tier in multiplier_tiers],
+            [tier['multiplier'] for tier in multiplier_tiers],
+            default=1.0
+        ) if multiplier_tiers else np.ones(len(tenure_months))
+        components['recency'] = candidate_arrays['recency_base'] * recency_rules.get('multiplier', 1.0) * tenure_multiplier
+
+        return components
+
+    def score_candidates(self, account: pd.Series, candidate_arrays: Dict, book_moments: Dict) -> Dict:
+        """
+        Scoring kernel for single-account routing.
+        Evaluates every candidate CSM at once and returns the total score vector along
+        with its per-component breakdown (lower is better).
+        """
+        num_books = book_moments['n']
+
+        def variance_after(field, current_values, delta):
+            field_moments = book_moments[field]
+            deviation = current_values - field_moments['shift']
+            total = field_moments['sum'] + delta
+            total_sq = field_moments['sum_sq'] + 2 * deviation * delta + delta * delta
+            mean = total / num_books
+            return np.maximum(total_sq / num_books - mean * mean, 0.0)
+
+        # Book balance after assignment (see variance_after_increment)
+        weights = self.scoring_rules['balance_weights']
+        balance = (
+            variance_after('count', candidate_arrays['count'], 1) * weights.get('count', 0) +
+            variance_after('total_neediness', candidate_arrays['total_neediness'], account.get('neediness_score', 0)) * weights.get('neediness', 0) +
+            variance_after('total_revenue', candidate_arrays['total_revenue'], account.get('revenue', 0)) * weights.get('revenue', 0) +
+            variance_after('total_tad', candidate_arrays['total_tad'], account.get('tad_score', 0)) * weights.get('tad', 0)
+        )
+
+        components = {'balance': balance}
+        components.update(self.calculate_rule_penalties(account, candidate_arrays))
+
+        return {
+            'csms': candidate_arrays['csms'],
+            'score': np.sum(list(components.values()), axis=0),
+            'components': components
+        }
+
+    def calculate_pair_penalties(self, accounts_df: pd.DataFrame, candidate_arrays: Dict) -> np.ndarray:
+        """
+        Per-(account, CSM) objective costs for the batch model, weighted by the
+        batch_objective_weights of the scoring rules. Rows follow accounts_df order,
+        columns follow candidate_arrays['csms'].
+        """
+        weights = self.scoring_rules['batch_objective_weights']
+        num_csms = len(candidate_arrays['csms'])
+
+        # The batch objective uses the unscaled recency penalty, same for every account
+        penalties = np.tile(weights.get('recency', 0) * candidate_arrays['recency_base'], (len(accounts_df), 1))
+
+        rule_weights = {
+            component: weights.get(component, 0)
+            for component in ['capacity'] + self.scoring_rules['rule_components']
+            if weights.get(component, 0)
+        }
+        if rule_weights:
+            for row, (_, account) in enumerate(accounts_df.iterrows()):
+                components = self.calculate_rule_penalties(account, candidate_arrays)
+                for component, weight in rule_weights.items():
+                    penalties[row] += weight * components[component]
+
+        return penalties.reshape(len(accounts_df), num_csms)
+
+    def start_score_audit(self, run_id: str, expected_rows: int = 4096):
+        """
+        Preallocate the score matrix for a run. Every candidate evaluation is written
+        as rows of component scores so audits don't cost per-CSM dicts or log lines.
+        """
+        components = ['balance', 'capacity'] + self.scoring_rules['rule_components'] + ['recency']
+        self.score_audit = {
+            'run_id': run_id,
+            'components': components,
+            'matrix': np.empty((expected_rows, len(components) + 1)),  # last column is the total score
+            'account_idx': np.empty(expected_rows, dtype=np.int32),
+            'csm_idx': np.empty(expected_rows, dtype=np.int32),
+            'evaluation_idx': np.empty(expected_rows, dtype=np.int32),
+            'accounts': [],
+            'csms': [],
+            'csm_positions': {},
+            'evaluations': 0,
+            'rows': 0
+        }
+
+    def record_score_evaluation(self, account_id: str, evaluation: Dict):
+        """Append one account's candidate scores to the run's score matrix"""
+        audit = self.score_audit
+        if audit is None:
+            return
+
+        num_candidates = len(evaluation['score'])
+        start = audit['rows']
+        stop = start + num_candidates
+
+        # Grow geometrically when the preallocated block is full
+        if stop > len(audit['matrix']):
+            new_size = max(stop, 2 * len(audit['matrix']))
+            audit['matrix'] = np.resize(audit['matrix'], (new_size, audit['matrix'].shape[1]))
+            for key in ('account_idx', 'csm_idx', 'evaluation_idx'):
+                audit[key] = np.resize(audit[key], new_size)
+
+        csm_positions = audit['csm_positions']
+        for csm in evaluation['csms']:
+            if csm not in csm_positions:
+                csm_positions[csm] = len(audit['csms'])
+                audit['csms'].append(csm)
+
+        for col, component in enumerate(audit['components']):
+            audit['matrix'][start:stop, col] = evaluation['components'].get(component, 0.0)
+        audit['matrix'][start:stop, -1] = evaluation['score']
+        audit['account_idx'][start:stop] = len(audit['accounts'])
+        audit['csm_idx'][start:stop] = [csm_positions[csm] for csm in evaluation['csms']]
+        audit['evaluation_idx'][start:stop] = audit['evaluations']
+
+        audit['accounts'].append(account_id)
+        audit['evaluations'] += 1
+        audit['rows'] = stop
+
+    def get_score_audit_frame(self) -> pd.DataFrame:
+        """Score matrix of the current run as a DataFrame (one row per account x candidate CSM)"""
+        audit = self.score_audit
+        if audit is None or audit['rows'] == 0:
+            return pd.DataFrame()
+
+        rows = audit['rows']
+        frame = pd.DataFrame(audit['matrix'][:rows], columns=audit['components'] + ['score'])
+        frame.insert(0, 'run_id', audit['run_id'])
+        frame.insert(1, 'evaluation', audit['evaluation_idx'][:rows])
+        frame.insert(2, 'account_id', pd.Categorical(np.asarray(audit['accounts'], dtype=object)[audit['account_idx'][:rows]]))
+        frame.insert(3, 'csm', pd.Categorical.from_codes(audit['csm_idx'][:rows], categories=audit['csms']))
+        return frame
+
+    def persist_score_audit(self, output_dir: str = None) -> Optional[str]:
+        """
+        Write the run's score matrix for offline analysis into output_dir (default:
+        score_audit.directory) - a single Parquet row group when pyarrow or fastparquet
+        is installed, CSV otherwise
+        """
+        frame = self.get_score_audit_frame()
+        if frame.empty:
+            return None
+
+        output_dir = output_dir or self.scoring_rules.get('score_audit', {}).get('directory', 'score_audit')
+        parquet_engine = next((engine for engine in ('pyarrow', 'fastparquet') if importlib.util.find_spec(engine)), None)
+        extension = 'parquet' if parquet_engine else 'csv'
+        output_file = os.path.join(output_dir, f"score_audit_{self.score_audit['run_id']}.{extension}")
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            if parquet_engine:
+                frame.to_parquet(output_file, engine=parquet_engine, index=False, row_group_size=len(frame))
+            else:
+                frame.to_csv(output_file, index=False)
+            logger.info(f"Saved {len(frame)} candidate scores for {self.score_audit['evaluations']} evaluations to {output_file}")
+            return output_file
+        except Exception as e:
+            # Optional output - don't fail the run if it can't be written
+            logger.warning(f"Could not save score audit to {output_file}: {str(e)}")
+            return None
+
+    def rank_top_candidates(self, scores: np.ndarray, top_n: int) -> np.ndarray:
+        """Indices of the top_n lowest scores in ascending order, ties broken by candidate order"""
+        top_n = min(top_n, len(scores))
+        if top_n == 0:
+            return np.array([], dtype=int)
+
+        if top_n < len(scores):
+            top_idx = np.argpartition(scores, top_n - 1)[:top_n]
+        else:
+            top_idx = np.arange(len(scores))
+
+        return top_idx[np.lexsort((top_idx, scores[top_idx]))]
+
+    def build_routing_context(self, csm_books: Dict, excluded_csms: list = None) -> Dict:
+        """
+        Load eligibility, recency and health data once for a sequence of single-account
+        assignments. update_routing_context keeps it current as accounts are placed, so
+        routing K accounts costs one round of warehouse reads instead of K.
+        """
+        eligible_csms = [csm for csm in self.eligible_csm_list if csm in csm_books]
+        health_distributions = self.cache_all_csm_health_distributions(eligible_csms)
+
+        return {
+            'eligible_csms': eligible_csms,
+            'excluded_csms': set(excluded_csms or []),
+            'recency_cache': self.cache_all_csm_recency_data(eligible_csms),
+            # Copies: placements update the context's view, never the run-level health cache
+            'health_distributions': {csm: dict(distribution) for csm, distribution in health_distributions.items()}
+        }
+
+    def update_routing_context(self, routing_context: Dict, csm: str, account: pd.Series):
+        """
+        Record an assignment in the routing context for the rest of the batch: recency as the
+        warehouse would see it on the next read, and the projected health mix of the CSM's book.
+        The run-level health cache still holds the warehouse view.
+        """
+        # CSMs already assigned in this batch are excluded from the rest of it
+        routing_context['excluded_csms'].add(csm)
+
+        # The stored recommendation counts as a last-hour recommendation on the next read
+        recent = routing_context['recency_cache'].setdefault(csm, {
+            'total_recommendations': 0,
+            'last_1_hour': 0,
+            'last_4_hours': 0,
+            'last_24_hours': 0,
+            'recent_assignments_7d': 0,
+            'avg_neediness_assigned': 0
+        })
+        previous_total = recent.get('total_recommendations', 0) or 0
+        previous_avg = recent.get('avg_neediness_assigned', 0) or 0
+        recent['avg_neediness_assigned'] = (
+            (previous_avg * previous_total + account.get('neediness_score', 0)) / (previous_total + 1)
+        )
+        for key in ('total_recommendations', 'last_1_hour', 'last_4_hours', 'last_24_hours', 'recent_assignments_7d'):
+            recent[key] = (recent.get(key, 0) or 0) + 1
+
+        # Keep the context's projected health mix in step with the placed account
+        health_dist = routing_context['health_distributions'].get(csm)
+        if health_dist is not None:
+            health = account.get('health_segment', 'Yellow')
+            health_dist[health] = health_dist.get(health, 0) + 1
+            health_dist['total'] = health_dist.get('total', 0) + 1
+
+    def assign_single_account_optimized(self, account: pd.Series, csm_books: Dict, excluded_csms: list = None,
+                                        routing_context: Dict = None) -> Tuple[str, float, list]:
         """
         Assign single account using optimization logic
         Considers book balance, health score distribution, and recent recommendations
+        Pass a routing_context from build_routing_context to reuse run-level data across calls
         Returns: (best_csm, optimization_score, top_alternatives_with_scores)
         """
         best_csm = None
         best_score = float('inf')
         run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-        # Track all CSM scores for ranking
-        all_csm_scores = []
-
         # Get eligible CSMs based on account segment and level
         segment_level = f"{account.get('segment', 'Residential').lower().replace(' & construction', '').replace(' ', '_')}_{account.get('account_level', 'Corporate').lower()}"
         max_accounts = self.limits.get(segment_level, {}).get('max_accounts_per_csm', 85)
 
         # Get all eligible CSMs (no MT filtering)
-        eligible_csms = [csm for csm in self.eligible_csm_list if csm in csm_books]
+        if routing_context is not None:
+            eligible_csms = routing_context['eligible_csms']
+            excluded_set = routing_context['excluded_csms'].union(excluded_csms or [])
+        else:
+            eligible_csms = [csm for csm in self.eligible_csm_list if csm in csm_books]
+            excluded_set = set(excluded_csms or [])
 
         # Remove excluded CSMs
-        if excluded_csms:
-            eligible_csms = [csm for csm in eligible_csms if csm not in excluded_csms]
-            logger.info(f"Excluding CSMs: {excluded_csms}")
+        if excluded_set:
+            eligible_csms = [csm for csm in eligible_csms if csm not in excluded_set]
+            logger.info(f"Excluding CSMs: {sorted(excluded_set)}")
 
         logger.info(f"Evaluating {len(eligible_csms)} eligible CSMs for account {account.get('account_id')} with health: {account.get('health_segment', 'Unknown')}")
         logger.info(f"Account segment: {account.get('segment')}, level: {account.get('account_level')}, max_accounts: {max_accounts}")
 
-        # Cache all CSM recency data at once to avoid repeated queries
-        recency_cache = self.cache_all_csm_recency_data(eligible_csms)
-
-        # Track health score distribution for each CSM
+        # Capacity constraint - TEMPORARILY DISABLED FOR TESTING
+        # Uncomment for production
+        # eligible_csms = [csm for csm in eligible_csms if csm_books[csm]['count'] < max_accounts]
         skipped_due_to_capacity = 0
-        for csm in eligible_csms:
-            # Check capacity constraint - TEMPORARILY DISABLED FOR TESTING
-            # Uncomment for production
-            # if csm_books[csm]['count'] >= max_accounts:
-            #     skipped_due_to_capacity += 1
-            #     continue
-
-            # Calculate current health distribution
-            csm_health_dist = self.get_csm_health_distribution(csm)
-
-            # Calculate what the book would look like with this account
-            simulated_books = copy.deepcopy(csm_books)
-            simulated_books[csm]['count'] += 1
-            simulated_books[csm]['total_neediness'] += account.get('neediness_score', 0)
-            simulated_books[csm]['total_revenue'] += account.get('revenue', 0)
-            simulated_books[csm]['total_tad'] += account.get('tad_score', 0)
-
-            # Calculate imbalance metrics after assignment
-            imbalance = self.calculate_book_imbalance(simulated_books)
-
-            # Base score calculation
-            score = (
-                imbalance['count_variance'] * 0.20 +
-                imbalance['neediness_variance'] * 0.25 +
-                imbalance['revenue_variance'] * 0.15 +
-                imbalance['tad_variance'] * 0.20
-            )
-
-            # Add STRONG penalty for high account counts (scaled to match variance magnitudes)
-            current_count = csm_books[csm]['count']
-            # Get max limit from config (default to 105 for residential_corporate)
-            max_accounts = self.limits.get('residential_corporate', {}).get('max_accounts_per_csm', 105)
-            warning_threshold = max_accounts - 5  # Start warning 5 accounts before max
-
-            if current_count >= max_accounts:
-                score += (current_count - (max_accounts - 1)) * 10000000  # 10M penalty per account over limit
-            elif current_count >= warning_threshold:
-                score += (current_count - (warning_threshold - 1)) * 1000000   # 1M penalty per account near limit
-            elif current_count >= (warning_threshold - 10):
-                score += (current_count - (warning_threshold - 11)) * 100000    # 100K penalty per account approaching limit
-
-            # Health score color matching and penalties
-            account_health = account.get('health_segment', 'Yellow')
-            csm_book_info = csm_books.get(csm, {})
-            health_dist = csm_book_info.get('health_distribution', {})
-
-            if account_health == 'Red':
-                # Red accounts need experienced CSMs
-                red_pct = (health_dist.get('Red', 0) / max(health_dist.get('total', 1), 1))
-
-                # Heavy penalty if CSM already has > 30% Red accounts
-                if red_pct > 0.3:
-                    score += 50
-
-                # Prefer senior CSMs for Red accounts
-                tenure_category = csm_book_info.get('tenure_category', 'Mid')
-                if tenure_category == 'New':
-                    score += 80  # Strong penalty for new CSMs with Red accounts
-                elif tenure_category == 'Junior':
-                    score += 40  # Moderate penalty for junior CSMs
-                elif tenure_category in ['Senior', 'Expert']:
-                    score -= 10  # Bonus for experienced CSMs handling Red accounts
-
-            elif account_health == 'Green':
-                # Green accounts can go to any CSM but prefer balancing
-                green_pct = (health_dist.get('Green', 0) / max(health_dist.get('total', 1), 1))
-                if green_pct > 0.5:
-                    score += 20  # Avoid concentration of Green accounts
-
-                # New CSMs can handle Green accounts well
-                if csm_book_info.get('tenure_category') == 'New' and green_pct < 0.6:
-                    score -= 5  # Small bonus for giving Green accounts to new CSMs
-
-            else:  # Yellow accounts
-                # Yellow accounts - balanced approach
-                yellow_pct = (health_dist.get('Yellow', 0) / max(health_dist.get('total', 1), 1))
-                if yellow_pct > 0.4:
-                    score += 15
-
-            # Tenure-based penalties and bonuses
-            tenure_months = csm_book_info.get('tenure_months', 6)
-            tenure_category = csm_book_info.get('tenure_category', 'Mid')
-
-            # High neediness accounts should go to experienced CSMs
-            if account.get('neediness_score', 0) >= 8:
-                if tenure_months < 3:
-                    score += 60  # Heavy penalty for new CSMs with high neediness
-                elif tenure_months < 6:
-                    score += 30  # Moderate penalty for junior CSMs
-                elif tenure_months >= 24:
-                    score -= 15  # Bonus for very experienced CSMs
-
-            # New CSMs shouldn't get too many accounts quickly
-            if tenure_months < 3:
-                current_count = csm_book_info.get('count', 0)
-                if current_count > 40:
-                    score += 50  # Penalty if new CSM already has many accounts
-                # Check recent assignments for new CSMs using cached data
-                recent_data = recency_cache.get(csm, {})
-                if recent_data.get('last_24_hours', 0) > 2:
-                    score += 100  # Heavy penalty for overloading new CSMs
-
-            # Add STRONG penalty for recent recommendations using cached data
-            recency_penalty = self.calculate_assignment_recency_penalty(csm, recency_cache)
-
-            # Multiply base recency penalty to make it more impactful
-            recency_penalty *= 2.0  # Double the impact of recency
-
-            # Adjust based on tenure (experienced CSMs can handle slightly more)
-            if tenure_months >= 24:
-                recency_penalty *= 0.8  # 20% reduction for expert CSMs
-            elif tenure_months < 6:
-                recency_penalty *= 1.5  # 50% increase for new/junior CSMs
-
-            score += recency_penalty
-
-            # Additional penalty based on neediness concentration
-            if account.get('neediness_score', 0) >= 8:
-                recent_data = recency_cache.get(csm, {})
-                avg_neediness = recent_data.get('avg_neediness_assigned')
-                if avg_neediness is not None and avg_neediness > 7:
-                    # Higher penalty for junior CSMs getting multiple high neediness
-                    if tenure_category in ['New', 'Junior']:
-                        score += 50
-                    else:
-                        score += 30
-
-            logger.debug(f"CSM {csm}: score={score:.2f}, recency_penalty={recency_penalty:.2f}, health_dist={csm_health_dist}")
-
-            # Track all CSM scores for alternatives
-            all_csm_scores.append({
-                'csm': csm,
-                'score': score,
-                'recency_penalty': recency_penalty,
-                'current_accounts': csm_books[csm]['count'],
-                'health_dist': csm_health_dist,
-                'recent_assignments_24h': recency_cache.get(csm, {}).get('last_24_hours', 0)
-            })
-
-            if score < best_score:
-                best_score = score
-                best_csm = csm
 
-        # Sort CSMs by score to get top alternatives
-        all_csm_scores.sort(key=lambda x: x['score'])
-
-        # Get top 5 alternatives (excluding the best one, but including it in the list for LLM to see)
-        top_alternatives = all_csm_scores[:6]  # Get top 6 (best + 5 alternatives)
+        top_alternatives = []
+        if eligible_csms:
+            # Cache all CSM recency data at once to avoid repeated queries
+            if routing_context is not None:
+                recency_cache = routing_context['recency_cache']
+            else:
+                recency_cache = self.cache_all_csm_recency_data(eligible_csms)
+
+            # Score every candidate at once
+            book_moments = self.calculate_book_moments(csm_books)
+            candidate_arrays = self.build_candidate_arrays(csm_books, eligible_csms, recency_cache)
+            evaluation = self.score_candidates(account, candidate_arrays, book_moments)
+            scores = evaluation['score']
+            self.record_score_evaluation(account.get('account_id'), evaluation)
+
+            # One grouped query for the run instead of one per candidate
+            if routing_context is not None:
+                health_dists = routing_context['health_distributions']
+            else:
+                health_dists = self.cache_all_csm_health_distributions(eligible_csms)
+
+            # Top 6 (best + 5 alternatives) for the LLM to see
+            top_idx = self.rank_top_candidates(scores, 6)
+            best_csm = eligible_csms[top_idx[0]]
+            best_score = float(scores[top_idx[0]])
+
+            # Full per-candidate breakdown is in the score audit; only the top
+            # candidates are turned into dicts for the LLM review
+            recency_scores = evaluation['components']['recency']
+            for idx in top_idx:
+                csm = eligible_csms[idx]
+                top_alternatives.append({
+                    'csm': csm,
+                    'score': float(scores[idx]),
+                    'recency_penalty': float(recency_scores[idx]),
+                    'current_accounts': csm_books[csm]['count'],
+                    'health_dist': dict(health_dists.get(csm, {})),
+                    'recent_assignments_24h': recency_cache.get(csm, {}).get('last_24_hours', 0)
+                })
 
         # Store the recommendation in the database
         if best_csm:
@@ -1354,33 +2088,500 @@ class CSMRoutingAutomation:
 
         return best_csm, best_score, top_alternatives
 
-    def optimize_batch_with_pulp(self, accounts_df: pd.DataFrame, csm_books: Dict, excluded_csms: list = None) -> Dict:
+    def select_batch_candidates(self, accounts_df: pd.DataFrame, csm_books: Dict, eligible_csms: list,
+                                pair_penalties: np.ndarray, pool_size: int,
+                                feasible_columns: np.ndarray) -> np.ndarray:
         """
-        Use PuLP to optimize batch assignment of multiple accounts
-        Includes recency penalty and health score distribution in the objective function
+        Keep the pool_size cheapest CSMs per account for the MIP.
+        Pairs are ranked by their pair cost plus the marginal count and neediness deviation
+        against the current books. Each account's column from a feasible assignment is always
+        kept, so the pruned model can never become infeasible.
+        Returns an (account row x CSM column) boolean mask of pairs to model.
         """
-        logger.info(f"Starting PuLP optimization for {len(accounts_df)} accounts")
-        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        weights = self.scoring_rules['batch_objective_weights']
+        account_neediness = accounts_df['neediness_score'].fillna(0).to_numpy(dtype=float)
+        counts = np.array([csm_books[csm]['count'] for csm in eligible_csms], dtype=float)
+        neediness = np.array([csm_books[csm]['total_neediness'] for csm in eligible_csms], dtype=float)
+        mean_count = (counts.sum() + len(accounts_df)) / len(eligible_csms)
+        mean_neediness = (neediness.sum() + account_neediness.sum()) / len(eligible_csms)
+
+        pair_scores = (
+            pair_penalties +
+            weights.get('count', 0) * (np.abs(counts + 1 - mean_count) - np.abs(counts - mean_count)) +
+            weights.get('neediness', 0) * (np.abs(neediness + account_neediness[:, None] - mean_neediness) -
+                                           np.abs(neediness - mean_neediness))
+        )
+
+        candidate_mask = np.zeros(pair_scores.shape, dtype=bool)
+        top_columns = np.argpartition(pair_scores, pool_size - 1, axis=1)[:, :pool_size]
+        np.put_along_axis(candidate_mask, top_columns, True, axis=1)
+        candidate_mask[np.arange(len(accounts_df)), feasible_columns] = True
 
-        # Initialize the optimization problem
+        logger.info(f"Candidate pruning kept {int(candidate_mask.sum())} of {candidate_mask.size} account-CSM pairs "
+                    f"(top {pool_size} per account)")
+        return candidate_mask
+
+    def build_account_classes(self, accounts_df: pd.DataFrame, pair_penalties: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Group accounts that are interchangeable in the batch objective.
+        Two accounts are equivalent when they have the same neediness and the same pair cost
+        against every CSM, so any permutation of them between CSMs has the same objective.
+        Returns the class of each account row and the first row of each class.
+        """
+        account_neediness = accounts_df['neediness_score'].fillna(0).to_numpy(dtype=float)
+        class_keys = np.column_stack([account_neediness, pair_penalties])
+        _, representatives, class_of_row = np.unique(class_keys, axis=0, return_index=True, return_inverse=True)
+        return class_of_row.reshape(-1), representatives
+
+    def build_batch_model(self, accounts_df: pd.DataFrame, csm_books: Dict, eligible_csms: list,
+                          pair_penalties: np.ndarray, max_accounts: int,
+                          candidate_mask: np.ndarray = None,
+                          class_sizes: np.ndarray = None) -> Tuple[pulp.LpProblem, list]:
+        """
+        Build the batch assignment MIP from coefficient vectors and the pair penalty matrix.
+        Every account is assigned exactly once, so the mean count and mean neediness per CSM
+        are constants and each deviation constraint only touches that CSM's column.
+        With class_sizes, each row stands for that many identical accounts and its variables
+        are integer counts per CSM instead of binaries.
+        Returns the problem and the (row x CSM column) matrix of assignment variables;
+        pairs outside candidate_mask have no variable (None).
+        """
         prob = pulp.LpProblem("CSM_Batch_Assignment", pulp.LpMinimize)
 
-        # Get eligible CSMs (all CSMs, no MT filtering)
-        eligible_csms = [csm for csm in self.eligible_csm_list if csm in csm_books]
+        num_rows = len(accounts_df)
+        num_csms = len(eligible_csms)
+        account_neediness = accounts_df['neediness_score'].fillna(0).to_numpy(dtype=float)
+        current_counts = np.array([csm_books[csm]['count'] for csm in eligible_csms], dtype=float)
+        current_neediness = np.array([csm_books[csm]['total_neediness'] for csm in eligible_csms], dtype=float)
+
+        if candidate_mask is None:
+            candidate_mask = np.ones((num_rows, num_csms), dtype=bool)
+        if class_sizes is None:
+            class_sizes = np.ones(num_rows, dtype=int)
+        num_accounts = int(class_sizes.sum())
+
+        # Create decision variables for the candidate pairs (binary for single accounts)
+        x_matrix = [
+            [(pulp.LpVariable(f"assign_{i}_{csm}", cat='Binary') if class_sizes[row] == 1 else
+              pulp.LpVariable(f"assign_{i}_{csm}", lowBound=0,
+                              upBound=int(min(class_sizes[row], max(max_accounts - current_counts[col], 0))),
+                              cat='Integer'))
+             if candidate_mask[row, col] else None
+             for col, csm in enumerate(eligible_csms)]
+            for row, i in enumerate(accounts_df.index)
+        ]
+        csm_columns = [
+            [(x_matrix[row][col], account_neediness[row]) for row in np.flatnonzero(candidate_mask[:, col])]
+            for col in range(num_csms)
+        ]
 
-        # Remove excluded CSMs
-        if excluded_csms:
-            eligible_csms = [csm for csm in eligible_csms if csm not in excluded_csms]
-            logger.info(f"Excluding CSMs from batch optimization: {excluded_csms}")
+        # Constraint: Each account must be assigned to exactly one CSM
+        for row, row_vars in enumerate(x_matrix):
+            prob += pulp.LpAffineExpression([(var, 1) for var in row_vars if var is not None]) == int(class_sizes[row])
 
-        # Get max accounts limit from config
-        segment_level = "residential_corporate"  # Default for now
-        max_accounts = self.limits.get(segment_level, {}).get('max_accounts_per_csm', 85)
+        # Projected means are fixed by the assignment constraint above
+        mean_count = (current_counts.sum() + num_accounts) / num_csms
+        mean_neediness = (current_neediness.sum() + (account_neediness * class_sizes).sum()) / num_csms
 
-        # PRE-FILTER: Remove CSMs who don't have enough capacity for batch assignment
-        # This prevents infeasibility when CSMs are already near/at their limits
-        batch_size = len(accounts_df)
-        min_capacity_needed = 2 if batch_size > 5 else 1  # Need at least 2 spots for larger batches
+        # Auxiliary variables for absolute deviations (PuLP linearization)
+        # We'll minimize the sum of positive and negative deviations
+        deviation_terms = {'count': [], 'neediness': []}
+        for col, csm in enumerate(eligible_csms):
+            new_assignments = pulp.LpAffineExpression([(var, 1) for var, _ in csm_columns[col]])
+            new_neediness = pulp.LpAffineExpression(csm_columns[col])
+
+            # Constraint: Respect CSM capacity limits
+            prob += new_assignments <= max_accounts - current_counts[col]
+
+            count_dev_pos = pulp.LpVariable(f"count_dev_pos_{csm}", lowBound=0, cat='Continuous')
+            count_dev_neg = pulp.LpVariable(f"count_dev_neg_{csm}", lowBound=0, cat='Continuous')
+            neediness_dev_pos = pulp.LpVariable(f"need_dev_pos_{csm}", lowBound=0, cat='Continuous')
+            neediness_dev_neg = pulp.LpVariable(f"need_dev_neg_{csm}", lowBound=0, cat='Continuous')
+
+            # projected - mean == pos - neg, with the constant parts moved to the right-hand side
+            prob += new_assignments - count_dev_pos + count_dev_neg == mean_count - current_counts[col]
+            prob += new_neediness - neediness_dev_pos + neediness_dev_neg == mean_neediness - current_neediness[col]
+
+            deviation_terms['count'] += [(count_dev_pos, 1), (count_dev_neg, 1)]
+            deviation_terms['neediness'] += [(neediness_dev_pos, 1), (neediness_dev_neg, 1)]
+
+        # Combined objective with weights from the scoring rules: sum of absolute deviations
+        # for count and neediness (revenue and TAD variance are not modeled) plus pair costs
+        batch_weights = self.scoring_rules['batch_objective_weights']
+        objective_terms = [(var, batch_weights.get('count', 0) * coef) for var, coef in deviation_terms['count']]
+        objective_terms += [(var, batch_weights.get('neediness', 0) * coef) for var, coef in deviation_terms['neediness']]
+        rows, cols = np.nonzero((pair_penalties != 0) & candidate_mask)
+        objective_terms += [(x_matrix[row][col], pair_penalties[row, col]) for row, col in zip(rows, cols)]
+        prob += pulp.LpAffineExpression(objective_terms)
+
+        logger.info(f"Built batch model with {int(candidate_mask.sum())} assignment variables for "
+                    f"{num_accounts} accounts ({num_rows} rows) x {num_csms} CSMs")
+
+        return prob, x_matrix
+
+    def get_batch_solver_settings(self, batch_size: int) -> Dict:
+        """Backend, time limit, relative MIP gap, thread count (0 = all cores) and warm start flag for a batch size"""
+        settings = {'backend': self.scoring_rules.get('batch_backend', 'cbc'),
+                    'time_limit_seconds': None, 'mip_gap': None, 'threads': 1, 'warm_start': False}
+        for tier in self.scoring_rules['batch_solver_tiers']:
+            if tier.get('max_batch_size') is None or batch_size <= tier['max_batch_size']:
+                settings.update({key: tier[key] for key in settings if key in tier})
+                break
+
+        if not settings['threads']:
+            settings['threads'] = os.cpu_count() or 1
+        return settings
+
+    def calculate_lp_relaxation_bound(self, prob: pulp.LpProblem) -> Optional[float]:
+        """Lower bound on the MIP objective from its LP relaxation"""
+        # The copy shares variable objects with prob, so the incumbent values are restored afterwards
+        incumbent = [(var, var.varValue) for var in prob.variables()]
+        try:
+            relaxed = prob.deepcopy()
+            relaxed.solve(pulp.PULP_CBC_CMD(msg=0, mip=False))
+            if pulp.LpStatus[relaxed.status] == 'Optimal':
+                return pulp.value(relaxed.objective)
+        except Exception as e:
+            logger.warning(f"Could not compute LP relaxation bound: {str(e)}")
+        finally:
+            for var, value in incumbent:
+                var.varValue = value
+        return None
+
+    def greedy_batch_assignment(self, accounts_df: pd.DataFrame, csm_books: Dict, eligible_csms: list,
+                                pair_penalties: np.ndarray, max_accounts: int) -> Optional[np.ndarray]:
+        """
+        Fast feasible assignment for warm-starting the batch MIP.
+        Places accounts one at a time, highest neediness first, on the CSM with the lowest
+        marginal batch objective (deviation change plus pair cost) that still has capacity.
+        Returns the chosen CSM column per account row, or None if capacity runs out.
+        """
+        weights = self.scoring_rules['batch_objective_weights']
+        account_neediness = accounts_df['neediness_score'].fillna(0).to_numpy(dtype=float)
+        counts = np.array([csm_books[csm]['count'] for csm in eligible_csms], dtype=float)
+        neediness = np.array([csm_books[csm]['total_neediness'] for csm in eligible_csms], dtype=float)
+        mean_count = (counts.sum() + len(accounts_df)) / len(eligible_csms)
+        mean_neediness = (neediness.sum() + account_neediness.sum()) / len(eligible_csms)
+
+        columns = np.full(len(accounts_df), -1, dtype=int)
+        for row in np.argsort(-account_neediness, kind='stable'):
+            marginal = (
+                weights.get('count', 0) * (np.abs(counts + 1 - mean_count) - np.abs(counts - mean_count)) +
+                weights.get('neediness', 0) * (np.abs(neediness + account_neediness[row] - mean_neediness) -
+                                               np.abs(neediness - mean_neediness)) +
+                pair_penalties[row]
+            )
+            marginal = np.where(counts < max_accounts, marginal, np.inf)
+            col = int(np.argmin(marginal))
+            if not np.isfinite(marginal[col]):
+                logger.warning("Greedy warm start ran out of CSM capacity - solving without a warm start")
+                return None
+
+            columns[row] = col
+            counts[col] += 1
+            neediness[col] += account_neediness[row]
+
+        return columns
+
+    def apply_warm_start(self, x_matrix: list, columns: np.ndarray, class_of_row: np.ndarray = None):
+        """Seed the assignment variables with a feasible assignment (counted per class when aggregated)"""
+        initial_values = np.zeros((len(x_matrix), len(x_matrix[0]) if x_matrix else 0), dtype=int)
+        model_rows = np.arange(len(columns)) if class_of_row is None else class_of_row
+        np.add.at(initial_values, (model_rows, columns), 1)
+        for row, row_vars in enumerate(x_matrix):
+            for col, var in enumerate(row_vars):
+                if var is not None:
+                    var.setInitialValue(int(initial_values[row, col]))
+
+    def extract_batch_columns(self, x_matrix: list, num_accounts: int, class_of_row: np.ndarray = None) -> np.ndarray:
+        """
+        Read the chosen CSM column per account row from a solved model (-1 if unassigned).
+        Aggregated class counts are handed out to the class members in row order.
+        """
+        solved_values = np.array([
+            [round(var.varValue) if var is not None and var.varValue is not None else 0 for var in row_vars]
+            for row_vars in x_matrix
+        ], dtype=int).reshape(len(x_matrix), -1)
+        model_rows = np.arange(num_accounts) if class_of_row is None else class_of_row
+
+        columns = np.full(num_accounts, -1, dtype=int)
+        for model_row, row_values in enumerate(solved_values):
+            members = np.flatnonzero(model_rows == model_row)
+            member_columns = np.repeat(np.arange(len(row_values)), np.maximum(row_values, 0))[:len(members)]
+            columns[members[:len(member_columns)]] = member_columns
+        return columns
+
+    def get_backend_solver(self, settings: Dict):
+        """
+        PuLP solver for the CBC or HiGHS backend (None for CP-SAT, which is solved directly).
+        A backend that is unknown or not installed falls back to CBC with a warning;
+        settings['requested_backend'] keeps the configured name next to settings['backend'].
+        """
+        settings.setdefault('requested_backend', settings['backend'])
+        if settings['backend'] not in BATCH_SOLVER_BACKENDS:
+            logger.warning(f"Unknown batch solver backend {settings['backend']} - using CBC for the batch model")
+            settings['backend'] = 'cbc'
+
+        if settings['backend'] == 'highs':
+            solver = pulp.HiGHS(
+                msg=False,
+                timeLimit=settings['time_limit_seconds'],
+                gapRel=settings['mip_gap'],
+                threads=settings['threads']
+            )
+            if solver.available():
+                return solver
+            logger.warning("highspy is not installed - using CBC instead of HiGHS for the batch model")
+            settings['backend'] = 'cbc'
+
+        if settings['backend'] == 'cpsat':
+            if cp_model is not None:
+                return None
+            logger.warning("ortools is not installed - using CBC instead of CP-SAT for the batch model")
+            settings['backend'] = 'cbc'
+
+        return pulp.PULP_CBC_CMD(
+            msg=0,
+            timeLimit=settings['time_limit_seconds'],
+            gapRel=settings['mip_gap'],
+            threads=settings['threads'],
+            warmStart=settings['warm_start']
+        )
+
+    def solve_with_cpsat(self, prob: pulp.LpProblem, settings: Dict):
+        """
+        Export a PuLP model to OR-Tools CP-SAT and solve it.
+        Continuous variables become integers in 1/CPSAT_CONTINUOUS_SCALE units and every
+        coefficient is scaled and rounded, which is exact for the batch model (0/1 assignment
+        columns, unit deviation columns, neediness to three decimals). Variable values and
+        the problem status are written back in PuLP terms.
+        """
+        if cp_model is None:
+            raise RuntimeError("ortools is not installed - CP-SAT backend unavailable (use get_backend_solver for the CBC fallback)")
+
+        model = cp_model.CpModel()
+
+        cp_vars = {}
+        for var in prob.variables():
+            step = 1.0 if var.cat == pulp.LpInteger else 1.0 / CPSAT_CONTINUOUS_SCALE
+            low = -CPSAT_DEFAULT_BOUND if var.lowBound is None else int(np.ceil(var.lowBound / step))
+            high = CPSAT_DEFAULT_BOUND if var.upBound is None else int(np.floor(var.upBound / step))
+            cp_vars[var.name] = (model.NewIntVar(low, high, var.name), step)
+            if settings['warm_start'] and var.varValue is not None:
+                model.AddHint(cp_vars[var.name][0], int(round(var.varValue / step)))
+
+        def scaled_terms(expression, scale):
+            return sum(
+                int(round(coef * cp_vars[var.name][1] * scale)) * cp_vars[var.name][0]
+                for var, coef in expression.items()
+            )
+
+        for constraint in prob.constraints.values():
+            lhs = scaled_terms(constraint, CPSAT_COEFFICIENT_SCALE)
+            rhs = int(round(-constraint.constant * CPSAT_COEFFICIENT_SCALE))
+            if constraint.sense == pulp.LpConstraintEQ:
+                model.Add(lhs == rhs)
+            elif constraint.sense == pulp.LpConstraintLE:
+                model.Add(lhs <= rhs)
+            else:
+                model.Add(lhs >= rhs)
+        model.Minimize(scaled_terms(prob.objective, CPSAT_OBJECTIVE_SCALE))
+
+        solver = cp_model.CpSolver()
+        if settings['time_limit_seconds']:
+            solver.parameters.max_time_in_seconds = float(settings['time_limit_seconds'])
+        if settings['mip_gap']:
+            solver.parameters.relative_gap_limit = float(settings['mip_gap'])
+        solver.parameters.num_workers = int(settings['threads'])
+        status = solver.Solve(model)
+
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            for var in prob.variables():
+                cp_var, step = cp_vars[var.name]
+                var.varValue = solver.Value(cp_var) * step
+            sol_status = pulp.LpSolutionOptimal if status == cp_model.OPTIMAL else pulp.LpSolutionIntegerFeasible
+            prob.assignStatus(pulp.LpStatusOptimal, sol_status)
+        elif status == cp_model.INFEASIBLE:
+            prob.assignStatus(pulp.LpStatusInfeasible, pulp.LpSolutionInfeasible)
+        else:
+            prob.assignStatus(pulp.LpStatusNotSolved, pulp.LpSolutionNoSolutionFound)
+
+    def solve_batch_model(self, prob: pulp.LpProblem, batch_size: int, settings: Dict = None) -> Dict:
+        """
+        Solve the batch model with the backend and solver settings for its size tier.
+        A feasible incumbent found before the time limit is accepted; its gap
+        against the LP relaxation bound is reported alongside the solve stats.
+        """
+        settings = dict(settings or self.get_batch_solver_settings(batch_size))
+        solver = self.get_backend_solver(settings)
+
+        start_time = time.time()
+        if solver is None:
+            self.solve_with_cpsat(prob, settings)
+        else:
+            prob.solve(solver)
+        solve_seconds = time.time() - start_time
+
+        proven_optimal = prob.sol_status == pulp.LpSolutionOptimal
+        has_solution = prob.sol_status in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible)
+        objective = pulp.value(prob.objective) if has_solution else None
+
+        gap = 0.0 if proven_optimal and not settings['mip_gap'] else None
+        if has_solution and gap is None:
+            bound = self.calculate_lp_relaxation_bound(prob)
+            if bound is not None and objective:
+                gap = max(objective - bound, 0.0) / abs(objective)
+
+        stats = {
+            'status': pulp.LpStatus[prob.status],
+            'solution_status': pulp.LpSolution[prob.sol_status],
+            'accepted': has_solution,
+            'proven_optimal': proven_optimal,
+            'objective': objective,
+            'gap': gap,
+            'solve_seconds': solve_seconds,
+            'batch_size': batch_size,
+            'engine': 'mip',
+            **settings
+        }
+        self.last_solve_stats = stats
+        self.solve_history.append({
+            'requested_backend': settings['requested_backend'],
+            'backend': settings['backend'],
+            'status': stats['status'],
+            'solution_status': stats['solution_status'],
+            'objective': objective,
+            'gap': gap,
+            'solve_seconds': solve_seconds,
+            'batch_size': batch_size,
+            'threads': settings['threads']
+        })
+
+        gap_desc = f"{gap:.2%}" if gap is not None else "n/a"
+        backend_desc = settings['backend'] if settings['backend'] == settings['requested_backend'] \
+            else f"{settings['backend']}, requested {settings['requested_backend']}"
+        logger.info(f"Batch solve ({backend_desc}): {stats['solution_status']} in {solve_seconds:.2f}s "
+                    f"(gap {gap_desc}, time limit {settings['time_limit_seconds']}s, "
+                    f"mip gap {settings['mip_gap']}, threads {settings['threads']}, "
+                    f"warm start {settings['warm_start']})")
+        return stats
+
+    def benchmark_batch_backends(self, prob: pulp.LpProblem, batch_size: int, backends: list = None) -> pd.DataFrame:
+        """
+        Solve the same batch model with each backend and compare status, objective and time.
+        Backends that are not installed are skipped with a warning; each row reports the
+        requested backend next to the one that solved. The model's variable values are
+        restored afterwards.
+        """
+        available = {'cbc': True, 'highs': pulp.HiGHS(msg=False).available(), 'cpsat': cp_model is not None}
+        incumbent = [(var, var.varValue) for var in prob.variables()]
+
+        results = []
+        for backend in backends or BATCH_SOLVER_BACKENDS:
+            if not available.get(backend):
+                logger.warning(f"Skipping batch solver backend {backend}: not installed")
+                continue
+            settings = {**self.get_batch_solver_settings(batch_size), 'backend': backend, 'warm_start': False}
+            stats = self.solve_batch_model(prob, batch_size, settings)
+            results.append({key: stats[key] for key in
+                            ('requested_backend', 'backend', 'status', 'solution_status', 'objective', 'gap',
+                             'solve_seconds', 'threads')})
+
+        for var, value in incumbent:
+            var.varValue = value
+        return pd.DataFrame(results)
+
+    def select_batch_engine(self) -> str:
+        """
+        Pick the batch engine from the active objective terms.
+        With no neediness deviation term the objective is a sum of per-(account, CSM) costs
+        plus a convex per-CSM count term, which the slot assignment engine solves exactly.
+        """
+        requested = self.scoring_rules.get('batch_engine', 'auto')
+        if requested == 'mip':
+            return 'mip'
+
+        if linear_sum_assignment is None:
+            if requested == 'assignment':
+                logger.warning("scipy is not installed - using the PuLP MIP for batch assignment")
+            return 'mip'
+
+        if self.scoring_rules['batch_objective_weights'].get('neediness', 0):
+            if requested == 'assignment':
+                logger.warning("Neediness deviation is weighted in the batch objective - using the PuLP MIP")
+            return 'mip'
+
+        return 'assignment'
+
+    def solve_batch_assignment(self, accounts_df: pd.DataFrame, csm_books: Dict, eligible_csms: list,
+                               pair_penalties: np.ndarray, max_accounts: int) -> Tuple[Optional[np.ndarray], Dict]:
+        """
+        Solve the batch as a linear assignment over capacity-expanded CSM slots.
+        Slot k of a CSM costs the change in weighted count deviation from taking a k-th new
+        account; those costs never decrease with k, so slots fill in order and the
+        optimum matches the MIP without the neediness term.
+        Returns the chosen CSM column per account row and solve stats.
+        """
+        start_time = time.time()
+        num_accounts = len(accounts_df)
+        count_weight = self.scoring_rules['batch_objective_weights'].get('count', 0)
+        current_counts = np.array([csm_books[csm]['count'] for csm in eligible_csms], dtype=float)
+        mean_count = (current_counts.sum() + num_accounts) / len(eligible_csms)
+
+        # One column per open slot, capped at the batch size per CSM
+        slots_per_csm = np.clip(max_accounts - current_counts, 0, num_accounts).astype(int)
+        slot_csm = np.repeat(np.arange(len(eligible_csms)), slots_per_csm)
+        slot_rank = np.arange(len(slot_csm)) - np.repeat(np.cumsum(slots_per_csm) - slots_per_csm, slots_per_csm)
+        slot_count = current_counts[slot_csm] + slot_rank
+        slot_cost = count_weight * (np.abs(slot_count + 1 - mean_count) - np.abs(slot_count - mean_count))
+
+        columns = None
+        if len(slot_csm) >= num_accounts:
+            rows, slots = linear_sum_assignment(pair_penalties[:, slot_csm] + slot_cost)
+            columns = np.empty(num_accounts, dtype=int)
+            columns[rows] = slot_csm[slots]
+
+        objective = None
+        if columns is not None:
+            final_counts = current_counts + np.bincount(columns, minlength=len(eligible_csms))
+            objective = float(count_weight * np.abs(final_counts - mean_count).sum() +
+                              pair_penalties[np.arange(num_accounts), columns].sum())
+
+        stats = {
+            'status': 'Optimal' if columns is not None else 'Infeasible',
+            'solution_status': 'Optimal Solution Found' if columns is not None else 'No Solution Found',
+            'accepted': columns is not None,
+            'proven_optimal': columns is not None,
+            'objective': objective,
+            'gap': 0.0 if columns is not None else None,
+            'solve_seconds': time.time() - start_time,
+            'batch_size': num_accounts,
+            'engine': 'assignment',
+            'slots': len(slot_csm)
+        }
+        self.last_solve_stats = stats
+
+        logger.info(f"Batch assignment solve: {stats['status']} over {len(slot_csm)} CSM slots in {stats['solve_seconds']:.3f}s")
+        return columns, stats
+
+    def get_batch_eligible_csms(self, csm_books: Dict, excluded_csms: list, batch_size: int) -> Tuple[list, int]:
+        """Eligible CSMs with room for a batch of this size, and the per-CSM account limit"""
+        # Get eligible CSMs (all CSMs, no MT filtering)
+        eligible_csms = [csm for csm in self.eligible_csm_list if csm in csm_books]
+
+        # Remove excluded CSMs
+        if excluded_csms:
+            excluded_set = set(excluded_csms)
+            eligible_csms = [csm for csm in eligible_csms if csm not in excluded_set]
+            logger.info(f"Excluding CSMs from batch optimization: {excluded_csms}")
+
+        # Get max accounts limit from config
+        segment_level = "residential_corporate"  # Default for now
+        max_accounts = self.limits.get(segment_level, {}).get('max_accounts_per_csm', 85)
+
+        # PRE-FILTER: Remove CSMs who don't have enough capacity for batch assignment
+        # This prevents infeasibility when CSMs are already near/at their limits
+        min_capacity_needed = 2 if batch_size > 5 else 1  # Need at least 2 spots for larger batches
 
         eligible_with_capacity = []
         for csm in eligible_csms:
@@ -1391,144 +2592,805 @@ class CSMRoutingAutomation:
             else:
                 logger.debug(f"Excluding {csm} from batch: only {available_capacity} spots available (need {min_capacity_needed})")
 
-        eligible_csms = eligible_with_capacity
+        return eligible_with_capacity, max_accounts
+
+    def solve_batch(self, accounts_df: pd.DataFrame, csm_books: Dict, eligible_csms: list,
+                    pair_penalties: np.ndarray, max_accounts: int) -> Tuple[Optional[np.ndarray], Dict]:
+        """
+        Solve one batch from its pair penalty matrix with the configured engine, backend,
+        pruning and formulation. No warehouse access, so it can run in worker processes.
+        Returns the chosen CSM column per account row (None if no solution) and solve stats.
+        """
+        if self.select_batch_engine() == 'assignment':
+            # Only per-pair and count terms are active: exact slot assignment, no MIP needed
+            assigned_columns, solve_stats = self.solve_batch_assignment(
+                accounts_df, csm_books, eligible_csms, pair_penalties, max_accounts
+            )
+        else:
+            solver_settings = self.get_batch_solver_settings(len(accounts_df))
+            pool_size = self.scoring_rules.get('batch_candidate_pool_size')
+            prune = bool(pool_size) and pool_size < len(eligible_csms)
+
+            # The greedy assignment is both the warm start and the pruning feasibility guard
+            greedy_columns = None
+            if solver_settings['warm_start'] or prune:
+                greedy_columns = self.greedy_batch_assignment(accounts_df, csm_books, eligible_csms, pair_penalties, max_accounts)
+
+            # Restrict each account to its cheapest CSMs before building the MIP
+            candidate_mask = None
+            if prune and greedy_columns is not None:
+                candidate_mask = self.select_batch_candidates(
+                    accounts_df, csm_books, eligible_csms, pair_penalties, pool_size, greedy_columns
+                )
+
+            # Collapse interchangeable accounts into classes with integer counts per CSM
+            class_of_row = None
+            model_df, model_penalties, class_sizes = accounts_df, pair_penalties, None
+            if self.scoring_rules.get('batch_formulation') == 'aggregated':
+                class_of_row, representatives = self.build_account_classes(accounts_df, pair_penalties)
+                if len(representatives) < len(accounts_df):
+                    model_df = accounts_df.iloc[representatives]
+                    model_penalties = pair_penalties[representatives]
+                    class_sizes = np.bincount(class_of_row, minlength=len(representatives))
+                    if candidate_mask is not None:
+                        class_mask = np.zeros((len(representatives), len(eligible_csms)), dtype=bool)
+                        np.logical_or.at(class_mask, class_of_row, candidate_mask)
+                        candidate_mask = class_mask
+                    logger.info(f"Aggregated {len(accounts_df)} accounts into {len(representatives)} account classes")
+                else:
+                    class_of_row = None
+
+            # Build the model from precomputed coefficient vectors and the penalty matrix
+            prob, x_matrix = self.build_batch_model(
+                model_df, csm_books, eligible_csms, model_penalties, max_accounts, candidate_mask, class_sizes
+            )
+
+            # Seed CBC with the greedy incumbent when the size tier asks for a warm start
+            if solver_settings['warm_start'] and greedy_columns is not None:
+                self.apply_warm_start(x_matrix, greedy_columns, class_of_row)
+            else:
+                solver_settings['warm_start'] = False
+
+            # Solve the optimization within the time limit / gap for this batch size
+            solve_stats = self.solve_batch_model(prob, len(accounts_df), solver_settings)
+
+            assigned_columns = None
+            if solve_stats['accepted']:
+                assigned_columns = self.extract_batch_columns(x_matrix, len(accounts_df), class_of_row)
+
+        return assigned_columns, solve_stats
+
+    def optimize_batch_with_pulp(self, accounts_df: pd.DataFrame, csm_books: Dict, excluded_csms: list = None,
+                                 run_id: str = None, store_recommendations: bool = True) -> Dict:
+        """
+        Use PuLP to optimize batch assignment of multiple accounts
+        Includes recency penalty and health score distribution in the objective function
+        """
+        logger.info(f"Starting PuLP optimization for {len(accounts_df)} accounts")
+        run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        batch_size = len(accounts_df)
+        eligible_csms, max_accounts = self.get_batch_eligible_csms(csm_books, excluded_csms, batch_size)
 
         if len(eligible_csms) < batch_size:
             logger.warning(f"Not enough eligible CSMs with capacity ({len(eligible_csms)}) for batch of {batch_size} accounts")
             # Fall back to individual assignment if not enough CSMs
-            return pd.DataFrame()
+            return {}
 
         # Cache all CSM recency data at once to avoid repeated queries
         recency_cache = self.cache_all_csm_recency_data(eligible_csms)
 
-        # Get health distributions for all CSMs
-        csm_health_dists = {}
-        for csm in eligible_csms:
-            csm_health_dists[csm] = self.get_csm_health_distribution(csm)
+        # Get health distributions for all CSMs (single grouped query, cached for the run)
+        csm_health_dists = self.cache_all_csm_health_distributions(eligible_csms)
 
-        # Create binary decision variables
-        x = {}
-        for i, account in accounts_df.iterrows():
-            for csm in eligible_csms:
-                x[i, csm] = pulp.LpVariable(f"assign_{i}_{csm}", cat='Binary')
+        # Per-(account, CSM) costs from the scoring rules: weighted recency penalty plus
+        # any rule components enabled in batch_objective_weights
+        candidate_arrays = self.build_candidate_arrays(csm_books, eligible_csms, recency_cache)
+        pair_penalties = self.calculate_pair_penalties(accounts_df, candidate_arrays)
 
-        # Constraint: Each account must be assigned to exactly one CSM
-        for i in accounts_df.index:
-            valid_vars = [x[i, csm] for csm in eligible_csms if (i, csm) in x]
-            if valid_vars:
-                prob += pulp.lpSum(valid_vars) == 1
+        # Solve with the engine the active objective terms call for
+        assigned_columns, solve_stats = self.solve_batch(accounts_df, csm_books, eligible_csms, pair_penalties, max_accounts)
 
-        # Constraint: Respect CSM capacity limits
-        # (max_accounts already defined above for pre-filtering)
-        for csm in eligible_csms:
-            current_count = csm_books[csm]['count']
-            new_assignments = pulp.lpSum([x[i, csm] for i in accounts_df.index if (i, csm) in x])
-            prob += current_count + new_assignments <= max_accounts
+        # Extract assignments and store recommendations (optimal or best incumbent)
+        assignments = {}
+        if solve_stats['accepted']:
+            objective_value = solve_stats['objective']
+            for row, i in enumerate(accounts_df.index):
+                if assigned_columns[row] < 0:
+                    continue
+                csm = eligible_csms[assigned_columns[row]]
+                account_id = accounts_df.loc[i, 'account_id']
+                assignments[account_id] = csm
+                if not store_recommendations:
+                    continue
 
-        # Calculate projected metrics for objective function
-        projected_counts = {}
-        projected_neediness = {}
-        projected_revenue = {}
-        projected_tad = {}
+                # Store recommendation in database
+                self.store_recommendation(
+                    account_id=account_id,
+                    csm_name=csm,
+                    account_data=accounts_df.loc[i],
+                    optimization_score=objective_value,
+                    method='batch_optimized',
+                    run_id=run_id,
+                    batch_size=len(accounts_df)
+                )
 
-        for csm in eligible_csms:
-            projected_counts[csm] = csm_books[csm]['count'] + pulp.lpSum(
-                [x[i, csm] for i in accounts_df.index if (i, csm) in x]
-            )
+            # Ranked alternatives for LLM review, priced against the solved books
+            if not hasattr(self, 'assignment_alternatives'):
+                self.assignment_alternatives = {}
+            recency_penalties = self.scoring_rules['batch_objective_weights'].get('recency', 0) * candidate_arrays['recency_base']
+            self.assignment_alternatives.update(self.build_batch_alternatives(
+                accounts_df, csm_books, eligible_csms, assigned_columns, pair_penalties, recency_penalties,
+                max_accounts, recency_cache, csm_health_dists
+            ))
+
+            logger.info(f"PuLP optimization completed successfully ({solve_stats['solution_status']}). Assigned {len(assignments)} accounts")
+            if store_recommendations:
+                logger.info(f"Stored {len(assignments)} recommendations in database with run_id: {run_id}")
+        else:
+            logger.error(f"PuLP optimization failed with status: {solve_stats['status']} ({solve_stats['solution_status']})")
 
-            projected_neediness[csm] = csm_books[csm]['total_neediness'] + pulp.lpSum(
-                [x[i, csm] * accounts_df.loc[i, 'neediness_score']
-                 for i in accounts_df.index if (i, csm) in x]
-            )
+        return assignments
 
-            projected_revenue[csm] = csm_books[csm]['total_revenue'] + pulp.lpSum(
-                [x[i, csm] * accounts_df.loc[i, 'revenue']
-                 for i in accounts_df.index if (i, csm) in x]
-            )
+    def solve_scenario(self, scenario: Dict, accounts_df: pd.DataFrame, csm_books: Dict, eligible_csms: list,
+                       recency_cache: Dict, max_accounts: int, threads: int) -> Dict:
+        """
+        Solve one batch under a scenario's scoring rules and report its balance metrics.
+        A scenario is a name plus scoring spec overrides (e.g. batch_objective_weights),
+        optionally on top of another rules_file. Runs without warehouse access.
+        """
+        base_spec = self.load_config(scenario['rules_file']) if scenario.get('rules_file') else self.scoring_spec
+        overrides = {key: value for key, value in scenario.items() if key not in ('name', 'rules_file')}
+
+        original_rules = self.scoring_rules
+        try:
+            self.scoring_rules = compile_scoring_rules(merge_scoring_spec(base_spec, overrides))
+            for tier in self.scoring_rules['batch_solver_tiers']:
+                tier['threads'] = threads
+
+            candidate_arrays = self.build_candidate_arrays(csm_books, eligible_csms, recency_cache)
+            pair_penalties = self.calculate_pair_penalties(accounts_df, candidate_arrays)
+            assigned_columns, solve_stats = self.solve_batch(accounts_df, csm_books, eligible_csms, pair_penalties, max_accounts)
+        finally:
+            self.scoring_rules = original_rules
+
+        result = {
+            'scenario': scenario.get('name'),
+            'status': solve_stats['status'],
+            'engine': solve_stats.get('engine'),
+            'requested_backend': solve_stats.get('requested_backend'),
+            'backend': solve_stats.get('backend'),
+            'objective': solve_stats['objective'],
+            'solve_seconds': solve_stats['solve_seconds'],
+            'assignments': {}
+        }
+        if not solve_stats['accepted']:
+            return result
+
+        projected_books = {csm: dict(book) for csm, book in csm_books.items()}
+        routed = np.flatnonzero(assigned_columns >= 0)
+        for row in routed:
+            account = accounts_df.iloc[row]
+            book = projected_books[eligible_csms[assigned_columns[row]]]
+            book['count'] += 1
+            book['total_neediness'] += account.get('neediness_score', 0) or 0
+            book['total_revenue'] += account.get('revenue', 0) or 0
+            book['total_tad'] += account.get('tad_score', 0) or 0
+            result['assignments'][account['account_id']] = eligible_csms[assigned_columns[row]]
+
+        imbalance = self.calculate_book_imbalance(projected_books)
+        result.update({
+            'assigned': len(routed),
+            'count_std': imbalance['count_std'],
+            'neediness_std': imbalance['neediness_std'],
+            'revenue_std': imbalance['revenue_std'],
+            'tad_std': imbalance['tad_std'],
+            'max_book_size': max(book['count'] for book in projected_books.values()),
+            # Unweighted recency cost of the chosen pairs, comparable across weightings
+            'recency_penalty': float(candidate_arrays['recency_base'][assigned_columns[routed]].sum())
+        })
+        return result
+
+    def run_batch_scenarios(self, accounts_df: pd.DataFrame, csm_books: Dict, scenarios: List[Dict],
+                            excluded_csms: list = None, max_workers: int = None) -> pd.DataFrame:
+        """
+        Solve the same batch under several scoring scenarios in parallel worker processes.
+        Warehouse data is loaded once here; workers only build penalties and solve. The
+        current rules are included as 'current', and moved_vs_current counts accounts each
+        scenario routes differently. Nothing is stored.
+        """
+        eligible_csms, max_accounts = self.get_batch_eligible_csms(csm_books, excluded_csms, len(accounts_df))
+        if len(eligible_csms) < len(accounts_df):
+            logger.warning(f"Not enough eligible CSMs with capacity ({len(eligible_csms)}) for scenario batch of {len(accounts_df)} accounts")
+            return pd.DataFrame()
+
+        recency_cache = self.cache_all_csm_recency_data(eligible_csms)
+        self.cache_all_csm_health_distributions(eligible_csms)
+
+        if not any(scenario.get('name') == 'current' for scenario in scenarios):
+            scenarios = [{'name': 'current'}] + list(scenarios)
+        workers = max(1, min(max_workers or os.cpu_count() or 1, len(scenarios)))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+
+        start_time = time.time()
+        args = (accounts_df, csm_books, eligible_csms, recency_cache, max_accounts, threads)
+        if workers == 1:
+            results = [self.solve_scenario(scenario, *args) for scenario in scenarios]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(self.solve_scenario, scenario, *args) for scenario in scenarios]
+                results = [future.result() for future in futures]
 
-            projected_tad[csm] = csm_books[csm]['total_tad'] + pulp.lpSum(
-                [x[i, csm] * accounts_df.loc[i, 'tad_score']
-                 for i in accounts_df.index if (i, csm) in x]
+        current = next(result['assignments'] for result in results if result['scenario'] == 'current')
+        for result in results:
+            assignments = result.pop('assignments')
+            result['moved_vs_current'] = sum(1 for account_id, csm in assignments.items() if current.get(account_id) != csm)
+
+        logger.info(f"Solved {len(scenarios)} batch scenarios with {workers} workers in {time.time() - start_time:.2f}s")
+        return pd.DataFrame(results)
+
+    def assign_accounts_sequentially(self, accounts_df: pd.DataFrame, csm_books: Dict, excluded_csms: list = None) -> Dict:
+        """
+        Fallback: assign accounts one by one with the single-account optimizer.
+        csm_books is updated in place as accounts are placed.
+        """
+        assignments = {}
+        # Load recency, health and eligibility once for the whole fallback pass;
+        # CSMs assigned in this batch are added to the context's exclusions
+        routing_context = self.build_routing_context(csm_books, excluded_csms=excluded_csms)
+        for _, account in accounts_df.iterrows():
+            csm, score, top_alternatives = self.assign_single_account_optimized(
+                account, csm_books, routing_context=routing_context
             )
+            if csm:
+                self.update_routing_context(routing_context, csm, account)
+                assignments[account['account_id']] = csm
+                # Store alternatives for LLM review
+                if not hasattr(self, 'assignment_alternatives'):
+                    self.assignment_alternatives = {}
+                self.assignment_alternatives[account['account_id']] = top_alternatives
+                # Update the csm_books for next account
+                csm_books[csm]['count'] += 1
+                csm_books[csm]['total_neediness'] += account.get('neediness_score', 0)
+                csm_books[csm]['total_revenue'] += account.get('revenue', 0)
+                csm_books[csm]['total_tad'] += account.get('tad_score', 0)
+                logger.info(f"Assigned {account['account_id']} to {csm} (fallback mode)")
+            else:
+                logger.warning(f"Could not assign account {account['account_id']} - all CSMs at capacity")
+        return assignments
 
-        # Objective: Minimize variance + recency penalties
-        mean_count = pulp.lpSum(projected_counts.values()) / len(eligible_csms)
-        mean_neediness = pulp.lpSum(projected_neediness.values()) / len(eligible_csms)
-        mean_revenue = pulp.lpSum(projected_revenue.values()) / len(eligible_csms)
-        mean_tad = pulp.lpSum(projected_tad.values()) / len(eligible_csms)
+    def use_rolling_horizon(self, accounts_df: pd.DataFrame, csm_books: Dict, excluded_csms: list = None) -> bool:
+        """Whether a backlog is too large for one batch model (or for the eligible CSM pool)"""
+        chunk_size = self.scoring_rules.get('rolling_horizon', {}).get('chunk_size')
+        if not chunk_size:
+            return False
+        if len(accounts_df) > chunk_size:
+            return True
+        eligible_csms, _ = self.get_batch_eligible_csms(csm_books, excluded_csms, len(accounts_df))
+        return len(eligible_csms) < len(accounts_df)
+
+    def prioritize_backlog(self, accounts_df: pd.DataFrame) -> pd.DataFrame:
+        """Order a backlog for chunked routing: health priority first, then highest neediness"""
+        health_priority = self.scoring_rules.get('rolling_horizon', {}).get('health_priority', ['Red', 'Yellow', 'Green'])
+        default_health = self.scoring_rules['account_defaults'].get('health_segment', 'Yellow')
+        rank = {health: position for position, health in enumerate(health_priority)}
+        health_rank = accounts_df['health_segment'].fillna(default_health).map(rank).fillna(len(rank))
+        neediness = accounts_df['neediness_score'].fillna(0)
+        order = np.lexsort((-neediness.to_numpy(dtype=float), health_rank.to_numpy(dtype=float)))
+        return accounts_df.iloc[order]
+
+    def calculate_move_costs(self, account_neediness: np.ndarray, source_columns: np.ndarray, pair_penalties: np.ndarray,
+                             counts: np.ndarray, neediness: np.ndarray, mean_count: float, mean_neediness: float,
+                             max_accounts: int) -> np.ndarray:
+        """
+        Change in the batch objective from moving each account to each CSM, given the
+        per-CSM counts and neediness of a solved assignment (one row per account).
+        Staying put costs 0; CSMs at capacity cost inf.
+        """
+        weights = self.scoring_rules['batch_objective_weights']
+        count_weight, neediness_weight = weights.get('count', 0), weights.get('neediness', 0)
+        rows = np.arange(len(source_columns))
+        source_counts, source_neediness = counts[source_columns], neediness[source_columns]
+
+        leave_delta = (
+            count_weight * (np.abs(source_counts - 1 - mean_count) - np.abs(source_counts - mean_count)) +
+            neediness_weight * (np.abs(source_neediness - account_neediness - mean_neediness) -
+                                np.abs(source_neediness - mean_neediness)) -
+            pair_penalties[rows, source_columns]
+        )
+        join_delta = (
+            count_weight * (np.abs(counts + 1 - mean_count) - np.abs(counts - mean_count)) +
+            neediness_weight * (np.abs(neediness + account_neediness[:, None] - mean_neediness) -
+                                np.abs(neediness - mean_neediness)) +
+            pair_penalties
+        )
+        move_costs = np.where(counts < max_accounts, join_delta + leave_delta[:, None], np.inf)
+        move_costs[rows, source_columns] = 0.0
+        return move_costs
 
-        # Create auxiliary variables for absolute deviations (PuLP linearization)
-        # We'll minimize the sum of positive and negative deviations
-        count_dev_pos = {}
-        count_dev_neg = {}
-        neediness_dev_pos = {}
-        neediness_dev_neg = {}
+    def build_batch_alternatives(self, accounts_df: pd.DataFrame, csm_books: Dict, eligible_csms: list,
+                                 assigned_columns: np.ndarray, pair_penalties: np.ndarray, recency_penalties: np.ndarray,
+                                 max_accounts: int, recency_cache: Dict, health_dists: Dict, top_n: int = 5) -> Dict:
+        """
+        Ranked alternative CSMs per batch account for LLM review, in the same shape as the
+        single-account path: rank 1 is the assigned CSM, followed by the top_n alternatives.
+        Each alternative is scored by the marginal batch objective of moving the account
+        there from its assigned CSM (0 for the assigned CSM), evaluated against the solved
+        book state - no re-solve. recency_penalty is the weighted recency term of the pair
+        cost, pair_penalty the full pair cost; current_accounts is the book size before the batch.
+        """
+        routed = np.flatnonzero(assigned_columns >= 0)
+        if len(routed) == 0:
+            return {}
 
-        for csm in eligible_csms:
-            count_dev_pos[csm] = pulp.LpVariable(f"count_dev_pos_{csm}", lowBound=0, cat='Continuous')
-            count_dev_neg[csm] = pulp.LpVariable(f"count_dev_neg_{csm}", lowBound=0, cat='Continuous')
-            neediness_dev_pos[csm] = pulp.LpVariable(f"need_dev_pos_{csm}", lowBound=0, cat='Continuous')
-            neediness_dev_neg[csm] = pulp.LpVariable(f"need_dev_neg_{csm}", lowBound=0, cat='Continuous')
-
-            # Add constraints to define deviations
-            prob += projected_counts[csm] - mean_count == count_dev_pos[csm] - count_dev_neg[csm]
-            prob += projected_neediness[csm] - mean_neediness == neediness_dev_pos[csm] - neediness_dev_neg[csm]
-
-        # Calculate variance components as sum of absolute deviations
-        count_variance = pulp.lpSum([count_dev_pos[csm] + count_dev_neg[csm] for csm in eligible_csms])
-        neediness_variance = pulp.lpSum([neediness_dev_pos[csm] + neediness_dev_neg[csm] for csm in eligible_csms])
-
-        # For simplicity, skip revenue and TAD variance in optimization
-        revenue_variance = 0
-        tad_variance = 0
-
-        # Add recency penalties to objective using cached data
-        recency_penalties = pulp.lpSum([
-            x[i, csm] * self.calculate_assignment_recency_penalty(csm, recency_cache)
-            for i in accounts_df.index
-            for csm in eligible_csms
-            if (i, csm) in x
-        ])
-
-        # Combined objective with weights - INCREASED recency penalty weight
-        prob += (
-            0.20 * count_variance +
-            0.20 * neediness_variance +
-            0.15 * revenue_variance +
-            0.15 * tad_variance +
-            0.30 * recency_penalties  # INCREASED recency penalty weight to 30%
+        account_neediness = accounts_df['neediness_score'].fillna(0).to_numpy(dtype=float)
+        current_counts = np.array([csm_books[csm]['count'] for csm in eligible_csms], dtype=float)
+        current_neediness = np.array([csm_books[csm]['total_neediness'] for csm in eligible_csms], dtype=float)
+        mean_count = (current_counts.sum() + len(accounts_df)) / len(eligible_csms)
+        mean_neediness = (current_neediness.sum() + account_neediness.sum()) / len(eligible_csms)
+        solved_counts = current_counts + np.bincount(assigned_columns[routed], minlength=len(eligible_csms))
+        solved_neediness = current_neediness + np.bincount(
+            assigned_columns[routed], weights=account_neediness[routed], minlength=len(eligible_csms)
         )
 
-        # Solve the optimization
-        prob.solve(pulp.PULP_CBC_CMD(msg=0))
+        move_costs = self.calculate_move_costs(
+            account_neediness[routed], assigned_columns[routed], pair_penalties[routed],
+            solved_counts, solved_neediness, mean_count, mean_neediness, max_accounts
+        )
+        move_costs[np.arange(len(routed)), assigned_columns[routed]] = np.inf
+
+        alternatives = {}
+        for position, row in enumerate(routed):
+            assigned = assigned_columns[row]
+            ranked = [assigned] + [col for col in self.rank_top_candidates(move_costs[position], top_n)
+                                   if np.isfinite(move_costs[position, col])]
+            alternatives[accounts_df.iloc[row]['account_id']] = [
+                {
+                    'csm': eligible_csms[col],
+                    'score': 0.0 if col == assigned else float(move_costs[position, col]),
+                    'recency_penalty': float(recency_penalties[col]),
+                    'pair_penalty': float(pair_penalties[row, col]),
+                    'current_accounts': int(current_counts[col]),
+                    'health_dist': dict(health_dists.get(eligible_csms[col], {})),
+                    'recent_assignments_24h': recency_cache.get(eligible_csms[col], {}).get('last_24_hours', 0)
+                }
+                for col in ranked
+            ]
+        return alternatives
 
-        # Extract assignments and store recommendations
+    def refine_backlog_assignment(self, accounts_df: pd.DataFrame, csm_books: Dict, eligible_csms: list,
+                                  columns: np.ndarray, max_accounts: int) -> Tuple[np.ndarray, float]:
+        """
+        Improve a chunked assignment against the full-backlog batch objective.
+        Repeatedly moves single accounts to the CSM with the largest objective decrease
+        (count and neediness deviation plus pair cost, evaluated in O(C) per account from
+        the per-CSM aggregates) until no improving move is left or the pass limit is hit.
+        The LLM review alternatives of every account are then rebuilt against the refined
+        full-backlog state, replacing the per-chunk lists.
+        Returns the refined columns and their objective value.
+        """
+        settings = self.scoring_rules.get('rolling_horizon', {})
+        weights = self.scoring_rules['batch_objective_weights']
+        count_weight, neediness_weight = weights.get('count', 0), weights.get('neediness', 0)
+
+        recency_cache = self.cache_all_csm_recency_data(eligible_csms)
+        health_dists = self.cache_all_csm_health_distributions(eligible_csms)
+        candidate_arrays = self.build_candidate_arrays(csm_books, eligible_csms, recency_cache)
+        pair_penalties = self.calculate_pair_penalties(accounts_df, candidate_arrays)
+
+        account_neediness = accounts_df['neediness_score'].fillna(0).to_numpy(dtype=float)
+        current_counts = np.array([csm_books[csm]['count'] for csm in eligible_csms], dtype=float)
+        current_neediness = np.array([csm_books[csm]['total_neediness'] for csm in eligible_csms], dtype=float)
+        mean_count = (current_counts.sum() + len(accounts_df)) / len(eligible_csms)
+        mean_neediness = (current_neediness.sum() + account_neediness.sum()) / len(eligible_csms)
+
+        columns = columns.copy()
+        counts = current_counts + np.bincount(columns, minlength=len(eligible_csms))
+        neediness = current_neediness + np.bincount(columns, weights=account_neediness, minlength=len(eligible_csms))
+
+        moves = 0
+        for _ in range(settings.get('max_refine_passes', 5)):
+            improved = False
+            for row in range(len(accounts_df)):
+                source, need = columns[row], account_neediness[row]
+                move_delta = self.calculate_move_costs(
+                    account_neediness[row:row + 1], columns[row:row + 1], pair_penalties[row:row + 1],
+                    counts, neediness, mean_count, mean_neediness, max_accounts
+                )[0]
+
+                target = int(np.argmin(move_delta))
+                if move_delta[target] < -1e-9:
+                    columns[row] = target
+                    counts[source] -= 1
+                    counts[target] += 1
+                    neediness[source] -= need
+                    neediness[target] += need
+                    moves += 1
+                    improved = True
+            if not improved:
+                break
+
+        objective = float(
+            count_weight * np.abs(counts - mean_count).sum() +
+            neediness_weight * np.abs(neediness - mean_neediness).sum() +
+            pair_penalties[np.arange(len(accounts_df)), columns].sum()
+        )
+        logger.info(f"Rolling-horizon refinement applied {moves} single-account moves (objective {objective:.2f})")
+
+        # Chunk alternatives were priced against each chunk's books; rank against the refined backlog instead
+        if not hasattr(self, 'assignment_alternatives'):
+            self.assignment_alternatives = {}
+        recency_penalties = weights.get('recency', 0) * candidate_arrays['recency_base']
+        self.assignment_alternatives.update(self.build_batch_alternatives(
+            accounts_df, csm_books, eligible_csms, columns, pair_penalties, recency_penalties,
+            max_accounts, recency_cache, health_dists
+        ))
+        return columns, objective
+
+    def optimize_backlog_rolling_horizon(self, accounts_df: pd.DataFrame, csm_books: Dict, excluded_csms: list = None) -> Dict:
+        """
+        Route a large backlog as a sequence of batch models.
+        Accounts are ordered by health priority and neediness, split into chunks no larger
+        than the eligible CSM pool, and each chunk is solved against the book state left by
+        the chunks before it. An optional refinement pass then improves the whole backlog
+        before recommendations are stored.
+        """
+        settings = self.scoring_rules.get('rolling_horizon', {})
+        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        ordered_df = self.prioritize_backlog(accounts_df)
+
+        # Chunk state is tracked on copies so the caller's books are untouched
+        working_books = {csm: dict(book) for csm, book in csm_books.items()}
+        eligible_csms, max_accounts = self.get_batch_eligible_csms(working_books, excluded_csms, len(ordered_df))
+        if not eligible_csms:
+            logger.warning("No eligible CSMs with capacity for rolling-horizon routing")
+            return {}
+        configured_chunk_size = settings.get('chunk_size') or len(ordered_df)
+
+        start_time = time.time()
         assignments = {}
-        if pulp.LpStatus[prob.status] == 'Optimal':
-            for i in accounts_df.index:
-                for csm in eligible_csms:
-                    if (i, csm) in x and x[i, csm].varValue == 1:
-                        account_id = accounts_df.loc[i, 'account_id']
-                        assignments[account_id] = csm
-
-                        # Store recommendation in database
-                        self.store_recommendation(
-                            account_id=account_id,
-                            csm_name=csm,
-                            account_data=accounts_df.loc[i],
-                            optimization_score=pulp.value(prob.objective),
-                            method='batch_optimized',
-                            run_id=run_id,
-                            batch_size=len(accounts_df)
-                        )
+        objective_value = 0.0
+        position = 0
+        while position < len(ordered_df):
+            # Earlier chunks fill CSMs, so the pool (and the largest feasible chunk) is re-read each time
+            remaining = len(ordered_df) - position
+            chunk_pool, _ = self.get_batch_eligible_csms(working_books, excluded_csms, min(configured_chunk_size, remaining))
+            chunk_size = min(configured_chunk_size, remaining, len(chunk_pool))
+            if chunk_size == 0:
+                logger.warning(f"No eligible CSMs with capacity left for rolling-horizon chunk at position {position}; stopping")
+                break
 
-            logger.info(f"PuLP optimization completed successfully. Assigned {len(assignments)} accounts")
-            logger.info(f"Stored {len(assignments)} recommendations in database with run_id: {run_id}")
-        else:
-            logger.error(f"PuLP optimization failed with status: {pulp.LpStatus[prob.status]}")
+            chunk_df = ordered_df.iloc[position:position + chunk_size]
+            chunk_assignments = self.optimize_batch_with_pulp(
+                chunk_df, working_books, excluded_csms=excluded_csms, run_id=run_id, store_recommendations=False
+            )
+            if not chunk_assignments:
+                logger.warning(f"Rolling-horizon chunk at position {position} returned no assignments; stopping")
+                break
+            objective_value += self.last_solve_stats['objective'] or 0.0
+            position += chunk_size
+
+            for _, account in chunk_df[chunk_df['account_id'].isin(chunk_assignments)].iterrows():
+                book = working_books[chunk_assignments[account['account_id']]]
+                book['count'] += 1
+                book['total_neediness'] += account.get('neediness_score', 0)
+                book['total_revenue'] += account.get('revenue', 0)
+                book['total_tad'] += account.get('tad_score', 0)
+            assignments.update(chunk_assignments)
+
+        # Refine the full backlog against the starting books
+        routed_df = ordered_df[ordered_df['account_id'].isin(assignments)]
+        if settings.get('refine') and len(routed_df) > 0:
+            column_of = {csm: col for col, csm in enumerate(eligible_csms)}
+            if all(csm in column_of for csm in assignments.values()):
+                columns = np.array([column_of[assignments[account_id]] for account_id in routed_df['account_id']])
+                columns, objective_value = self.refine_backlog_assignment(
+                    routed_df, csm_books, eligible_csms, columns, max_accounts
+                )
+                assignments = dict(zip(routed_df['account_id'], (eligible_csms[col] for col in columns)))
 
+        for _, account in routed_df.iterrows():
+            self.store_recommendation(
+                account_id=account['account_id'],
+                csm_name=assignments[account['account_id']],
+                account_data=account,
+                optimization_score=objective_value,
+                method='batch_rolling_horizon',
+                run_id=run_id,
+                batch_size=len(accounts_df)
+            )
+
+        # Accounts no chunk could place go through the sequential fallback against the routed books
+        leftover_df = ordered_df[~ordered_df['account_id'].isin(assignments)]
+        if len(leftover_df) > 0:
+            logger.warning(f"Routing {len(leftover_df)} backlog accounts the rolling horizon could not place one by one")
+            fallback_books = {csm: dict(book) for csm, book in csm_books.items()}
+            for _, account in routed_df.iterrows():
+                book = fallback_books[assignments[account['account_id']]]
+                book['count'] += 1
+                book['total_neediness'] += account.get('neediness_score', 0)
+                book['total_revenue'] += account.get('revenue', 0)
+                book['total_tad'] += account.get('tad_score', 0)
+            assignments.update(self.assign_accounts_sequentially(leftover_df, fallback_books, excluded_csms=excluded_csms))
+
+        logger.info(f"Rolling-horizon routing assigned {len(assignments)} of {len(accounts_df)} accounts "
+                    f"in chunks of up to {configured_chunk_size} ({time.time() - start_time:.2f}s)")
         return assignments
 
+    def build_rebalancing_units(self, books_df: pd.DataFrame, parent_child_accounts: Dict = None) -> np.ndarray:
+        """
+        Unit (decision row) of each account for rebalancing. Accounts in the same
+        parent-child group share a unit so they always move together.
+        """
+        unit_of_row = np.arange(len(books_df))
+        if not parent_child_accounts:
+            return unit_of_row
+
+        row_of_account = {account_id: row for row, account_id in enumerate(books_df['account_id'])}
+        for parent_id, child_ids in parent_child_accounts.items():
+            member_rows = [row_of_account[account_id] for account_id in [parent_id, *child_ids] if account_id in row_of_account]
+            if len(member_rows) > 1:
+                member_units = unit_of_row[member_rows]
+                unit_of_row[np.isin(unit_of_row, member_units)] = member_units.min()
+
+        # Renumber units densely in first-seen order
+        _, unit_of_row = np.unique(unit_of_row, return_inverse=True)
+        return unit_of_row.reshape(-1)
+
+    def rebalance_csm_books(self, books_df: pd.DataFrame = None, csm_list: list = None,
+                            fixed_assignments: Dict = None, restricted_assignments: Dict = None,
+                            parent_child_accounts: Dict = None, category_limits: Dict = None,
+                            max_accounts_per_csm: int = None) -> pd.DataFrame:
+        """
+        Full-book rebalancing MIP, productionized from the backup rebalancer.
+        Every value the constraints need is precomputed as a per-unit vector or category
+        mask, and each CSM constraint is built from the nonzero rows of its column only.
+
+        Args:
+            books_df: Accounts with their current csm_name (defaults to the Residential Corporate book frame)
+            csm_list: CSMs to rebalance across (defaults to eligible_csm_list, so managers and inactive
+                CSMs in the book frame get no accounts) - new CSMs may have no accounts, leaving CSMs are left out
+            fixed_assignments: {csm: [account_id, ...]} accounts that must go to that CSM
+            restricted_assignments: {csm: [account_id, ...]} accounts that must not go to that CSM
+            parent_child_accounts: {parent_account_id: [child_account_id, ...]} groups that move together
+            category_limits: {(segment, account_level): (csm_list, limit)} CSMs that hold only that
+                category, with about `limit` accounts of it
+
+        Returns: books_df with a new_csm_name column, or an empty frame if no solution was found
+        """
+        settings = self.scoring_rules.get('rebalancing', {})
+        weights = settings.get('objective_weights', {})
+        books_df = (self.csm_book_frame if books_df is None else books_df).reset_index(drop=True)
+        csm_list = list(csm_list if csm_list is not None else self.eligible_csm_list)
+        if not csm_list:
+            logger.error("No CSMs to rebalance across - load the eligible CSMs or pass csm_list")
+            return pd.DataFrame()
+        if max_accounts_per_csm is None:
+            max_accounts_per_csm = self.limits.get('residential_corporate', {}).get('max_accounts_per_csm', 85)
+
+        start_time = time.time()
+        num_csms = len(csm_list)
+        csm_index = {csm: col for col, csm in enumerate(csm_list)}
+
+        # Decision units and per-unit value vectors
+        unit_of_row = self.build_rebalancing_units(books_df, parent_child_accounts)
+        num_units = int(unit_of_row.max()) + 1 if len(unit_of_row) else 0
+        unit_counts = np.bincount(unit_of_row, minlength=num_units).astype(float)
+        unit_neediness = np.bincount(unit_of_row, weights=books_df['neediness_score'].fillna(0).to_numpy(dtype=float),
+                                     minlength=num_units)
+
+        # Accounts already with each CSM, for the shuffling penalty
+        current_cols = books_df['csm_name'].map(csm_index)
+        staying = np.zeros((num_units, num_csms))
+        has_current = current_cols.notna().to_numpy()
+        np.add.at(staying, (unit_of_row[has_current], current_cols[has_current].astype(int).to_numpy()), 1)
+        moved_accounts = unit_counts[:, None] - staying
+
+        # Allowed (unit, CSM) pairs from fixed and restricted assignments
+        allowed = np.ones((num_units, num_csms), dtype=bool)
+        row_of_account = {account_id: row for row, account_id in enumerate(books_df['account_id'])}
+        for csm, account_ids in (restricted_assignments or {}).items():
+            if csm in csm_index:
+                rows = [row_of_account[account_id] for account_id in account_ids if account_id in row_of_account]
+                allowed[unit_of_row[rows], csm_index[csm]] = False
+        for csm, account_ids in (fixed_assignments or {}).items():
+            if csm not in csm_index:
+                logger.warning(f"Fixed assignment CSM {csm} is not in the rebalancing roster - ignoring")
+                continue
+            rows = [row_of_account[account_id] for account_id in account_ids if account_id in row_of_account]
+            fixed_units = unit_of_row[rows]
+            keep = allowed[fixed_units, csm_index[csm]]
+            allowed[fixed_units] = False
+            allowed[fixed_units, csm_index[csm]] = keep
+
+        prob = pulp.LpProblem("CSM_Book_Rebalancing", pulp.LpMinimize)
+        unit_rows, unit_cols = np.nonzero(allowed)
+        x_vars = {
+            (unit, col): pulp.LpVariable(f"x_{unit}_{col}", cat='Binary')
+            for unit, col in zip(unit_rows.tolist(), unit_cols.tolist())
+        }
+        column_units = [np.flatnonzero(allowed[:, col]) for col in range(num_csms)]
+
+        def column_expression(col, values):
+            return pulp.LpAffineExpression([
+                (x_vars[unit, col], values[unit]) for unit in column_units[col] if values[unit]
+            ])
+
+        # Each unit goes to exactly one CSM
+        for unit in range(num_units):
+            prob += pulp.LpAffineExpression([(x_vars[unit, col], 1) for col in np.flatnonzero(allowed[unit])]) == 1
+
+        # Balancing scopes: CSMs with a category limit share that category's accounts,
+        # every other CSM shares the remaining accounts
+        scopes = []
+        limited_rows = np.zeros(len(books_df), dtype=bool)
+        slack = settings.get('category_limit_slack', 2)
+        for (segment, account_level), (limit_csms, limit) in (category_limits or {}).items():
+            category_rows = ((books_df['segment'] == segment) & (books_df['account_level'] == account_level)).to_numpy()
+            limited_rows |= category_rows
+            in_category = np.bincount(unit_of_row, weights=category_rows.astype(float), minlength=num_units)
+            limit_cols = [csm_index[csm] for csm in limit_csms if csm in csm_index]
+            scopes.append((limit_cols, category_rows))
+
+            # Listed CSMs hold only that (segment, account level), about `limit` of them
+            for col in limit_cols:
+                category_expression = column_expression(col, in_category)
+                prob += category_expression <= limit + slack
+                prob += category_expression >= limit - slack
+                prob += category_expression == column_expression(col, unit_counts)
+        limited_cols = {col for cols, _ in scopes for col in cols}
+        scopes.append(([col for col in range(num_csms) if col not in limited_cols], ~limited_rows))
+
+        def scope_totals(values, scope_rows):
+            return np.bincount(unit_of_row[scope_rows], weights=values[scope_rows], minlength=num_units)
+
+        objective_terms = []
+        row_neediness = books_df['neediness_score'].fillna(0).to_numpy(dtype=float)
+        for scope_cols, scope_rows in scopes:
+            if not scope_cols:
+                continue
+
+            # Capacity and neediness deviation per CSM
+            mean_neediness = row_neediness[scope_rows].sum() / len(scope_cols)
+            for col in scope_cols:
+                prob += column_expression(col, unit_counts) <= max_accounts_per_csm
+                dev_pos = pulp.LpVariable(f"need_dev_pos_{col}", lowBound=0)
+                dev_neg = pulp.LpVariable(f"need_dev_neg_{col}", lowBound=0)
+                prob += column_expression(col, unit_neediness) - dev_pos + dev_neg == mean_neediness
+                objective_terms += [(dev_pos, weights.get('neediness', 1.0)), (dev_neg, weights.get('neediness', 1.0))]
+
+            # Category balance bands, e.g. health colour mix per CSM
+            for band in settings.get('category_balance', []):
+                if band['column'] not in books_df.columns:
+                    continue
+                in_category = scope_totals((books_df[band['column']] == band['value']).to_numpy(dtype=float), scope_rows)
+                if not in_category.any():
+                    continue
+                mean_category = in_category.sum() / len(scope_cols)
+                for col in scope_cols:
+                    expression = column_expression(col, in_category)
+                    prob += expression <= np.ceil(mean_category * band['upper'])
+                    prob += expression >= np.floor(mean_category * band['lower'])
+
+            # Numeric balance bands, e.g. revenue within tolerance of the mean
+            for band in settings.get('numeric_balance', []):
+                if band['column'] not in books_df.columns:
+                    continue
+                unit_values = scope_totals(books_df[band['column']].fillna(0).to_numpy(dtype=float), scope_rows)
+                mean_value = unit_values.sum() / len(scope_cols)
+                for col in scope_cols:
+                    expression = column_expression(col, unit_values)
+                    prob += expression <= mean_value * (1 + band['tolerance'])
+                    prob += expression >= max(0.0, mean_value * (1 - band['tolerance']))
+
+        # Shuffling penalty per account moved off its current CSM
+        shuffle_weight = weights.get('shuffle', 0)
+        if shuffle_weight:
+            objective_terms += [
+                (var, shuffle_weight * moved_accounts[unit, col])
+                for (unit, col), var in x_vars.items() if moved_accounts[unit, col]
+            ]
+        prob += pulp.LpAffineExpression(objective_terms)
+
+        logger.info(f"Built rebalancing model with {len(x_vars)} variables for {len(books_df)} accounts "
+                    f"({num_units} units) x {num_csms} CSMs in {time.time() - start_time:.2f}s")
+
+        solver_settings = {**self.get_batch_solver_settings(len(books_df)), 'warm_start': False,
+                           **settings.get('solver', {})}
+        if not solver_settings['threads']:
+            solver_settings['threads'] = os.cpu_count() or 1
+        solve_stats = self.solve_batch_model(prob, len(books_df), solver_settings)
+        if not solve_stats['accepted']:
+            logger.error(f"Rebalancing failed with status: {solve_stats['status']} ({solve_stats['solution_status']})")
+            return pd.DataFrame()
+
+        unit_csm = np.full(num_units, -1, dtype=int)
+        for (unit, col), var in x_vars.items():
+            if var.varValue is not None and var.varValue > 0.5:
+                unit_csm[unit] = col
+
+        rebalanced_df = books_df.copy()
+        rebalanced_df['new_csm_name'] = [csm_list[col] if col >= 0 else None for col in unit_csm[unit_of_row]]
+        moved = int((rebalanced_df['new_csm_name'] != rebalanced_df['csm_name']).sum())
+        logger.info(f"Rebalancing {solve_stats['solution_status']}: {moved} of {len(books_df)} accounts change CSM")
+        return rebalanced_df
+
+    def redistribute_departing_book(self, departing_csm: str, books_df: pd.DataFrame = None, remaining_csms: list = None,
+                                    max_accounts_per_csm: int = None, restarts: int = None, seed: int = None,
+                                    max_workers: int = None) -> pd.DataFrame:
+        """
+        Spread a departing CSM's book over the remaining CSMs, replacing the backup's random
+        sampling over calculate_cost. Every other account stays put; the departing accounts
+        are placed by local_search_redistribution from several seeded starts run in worker
+        processes, and the lowest objective wins (ties go to the lower seed), so the same
+        inputs always give the same assignment. remaining_csms defaults to eligible_csm_list,
+        so managers and inactive CSMs in the book frame receive none of the accounts.
+
+        Returns: books_df with a new_csm_name column, or an empty frame if the book does not fit
+        """
+        settings = self.scoring_rules.get('rebalancing', {}).get('redistribution', {})
+        weights = settings.get('objective_weights', {})
+        weight_vector = np.array([weights.get(metric, 1.0) for metric in ['neediness', 'red', 'yellow', 'green']])
+        restarts = restarts or settings.get('restarts', 8)
+        seed = settings.get('seed', 0) if seed is None else seed
+        books_df = (self.csm_book_frame if books_df is None else books_df).reset_index(drop=True)
+        if remaining_csms is None:
+            remaining_csms = self.eligible_csm_list
+        remaining_csms = [csm for csm in remaining_csms if csm != departing_csm]
+        if max_accounts_per_csm is None:
+            max_accounts_per_csm = self.limits.get('residential_corporate', {}).get('max_accounts_per_csm', 85)
+
+        start_time = time.time()
+        csm_index = {csm: col for col, csm in enumerate(remaining_csms)}
+        default_health = self.scoring_rules['account_defaults'].get('health_segment', 'Yellow')
+        health_col = {segment: col for col, segment in enumerate(REDISTRIBUTION_HEALTH_SEGMENTS)}
+        row_health = books_df['health_segment'].fillna(default_health).map(health_col).fillna(-1).to_numpy(dtype=int)
+        row_neediness = books_df['neediness_score'].fillna(0).to_numpy(dtype=float)
+
+        # Aggregates of the accounts the remaining CSMs keep
+        kept_cols = books_df['csm_name'].map(csm_index)
+        kept = kept_cols.notna().to_numpy()
+        kept_cols = kept_cols[kept].astype(int).to_numpy()
+        num_csms = len(remaining_csms)
+        base_counts = np.bincount(kept_cols, minlength=num_csms).astype(float)
+        base_neediness = np.bincount(kept_cols, weights=row_neediness[kept], minlength=num_csms)
+        base_health = np.zeros((num_csms, len(REDISTRIBUTION_HEALTH_SEGMENTS)))
+        known = row_health[kept] >= 0
+        np.add.at(base_health, (kept_cols[known], row_health[kept][known]), 1)
+
+        departing_rows = np.flatnonzero((books_df['csm_name'] == departing_csm).to_numpy())
+        capacity = np.full(num_csms, float(max_accounts_per_csm))
+        if not num_csms or np.maximum(capacity - base_counts, 0).sum() < len(departing_rows):
+            logger.error(f"Not enough capacity across {num_csms} remaining CSMs for {len(departing_rows)} accounts of {departing_csm}")
+            return pd.DataFrame()
+
+        args = (base_counts, base_neediness, base_health, row_neediness[departing_rows], row_health[departing_rows],
+                capacity, weight_vector)
+        seeds = [seed + restart for restart in range(restarts)]
+        max_passes = settings.get('max_passes', 50)
+        workers = max(1, min(max_workers or os.cpu_count() or 1, restarts))
+        if workers == 1:
+            results = [local_search_redistribution(*args, restart_seed, max_passes) for restart_seed in seeds]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(local_search_redistribution, *args, restart_seed, max_passes) for restart_seed in seeds]
+                results = [future.result() for future in futures]
+
+        # Fewest unassigned accounts first, then the lowest objective
+        best = min(range(restarts), key=lambda restart: ((results[restart][0] < 0).sum(), results[restart][1], restart))
+        columns, objective = results[best]
+
+        redistributed_df = books_df.copy()
+        redistributed_df['new_csm_name'] = redistributed_df['csm_name']
+        redistributed_df.loc[departing_rows, 'new_csm_name'] = [remaining_csms[col] if col >= 0 else None for col in columns]
+        if (columns < 0).any():
+            logger.warning(f"{int((columns < 0).sum())} accounts of {departing_csm} could not be placed within capacity "
+                           f"and have no new_csm_name")
+        logger.info(f"Redistributed {len(departing_rows)} accounts of {departing_csm} over {num_csms} CSMs "
+                    f"(objective {objective:.4f}, best of {restarts} starts from seed {seeds[best]}, "
+                    f"{workers} workers) in {time.time() - start_time:.2f}s")
+        return redistributed_df
+
     def _prepare_assignment_analysis(self, assignments: Dict, accounts_df: pd.DataFrame, csm_books: Dict) -> Dict:
         """Prepare detailed assignment analysis for LLM review"""
         analysis = {
@@ -1537,11 +3399,15 @@ class CSMRoutingAutomation:
             'health_distribution': {}
         }
 
+        # Last 7 days for every assigned CSM in one grouped query
+        recent_by_csm = self.get_recent_recommendations_for_csms(list(assignments.values()), 168)
+        accounts_by_id = accounts_df.drop_duplicates('account_id').set_index('account_id', drop=False)
+
         # Detailed assignment information
         for account_id, csm_name in assignments.items():
-            account_info = accounts_df[accounts_df['account_id'] == account_id].iloc[0] if not accounts_df[accounts_df['account_id'] == account_id].empty else {}
+            account_info = accounts_by_id.loc[account_id] if account_id in accounts_by_id.index else {}
             csm_info = csm_books.get(csm_name, {})
-            recent_recs = self.get_recent_csm_recommendations(csm_name, 168)  # Last 7 days
+            recent_recs = recent_by_csm[csm_name]
 
             analysis['assignments'].append({
                 'account_id': account_id,
@@ -1571,8 +3437,9 @@ class CSMRoutingAutomation:
             })
 
         # Current book statistics
+        csm_health_dists = self.cache_all_csm_health_distributions(list(csm_books.keys()))
         for csm, info in csm_books.items():
-            health_dist = self.get_csm_health_distribution(csm)
+            health_dist = csm_health_dists[csm]
             csm_stat = {
                 'csm': csm,
                 'accounts': info['count'],
@@ -1605,39 +3472,49 @@ class CSMRoutingAutomation:
         return analysis
 
     def _get_historical_performance_data(self, csm_names: list) -> Dict:
-        """Get historical performance metrics for CSMs"""
-        performance_data = {}
+        """Get historical performance metrics for CSMs with one grouped 30-day query"""
+        csm_list = list(dict.fromkeys(csm_names))
+        if not csm_list:
+            return {}
 
-        for csm in set(csm_names):
-            # Get 30-day historical data
-            query = f"""
-            SELECT
-                COUNT(DISTINCT account_id) as accounts_assigned_30d,
-                AVG(neediness_score) as avg_neediness_assigned,
-                SUM(CASE WHEN neediness_score >= 8 THEN 1 ELSE 0 END) as high_neediness_count,
-                COUNT(DISTINCT DATE(recommendation_timestamp)) as active_days,
-                MAX(neediness_score) as max_neediness_assigned,
-                MIN(neediness_score) as min_neediness_assigned
-            FROM {self.recommendations_table}
-            WHERE recommended_csm = '{csm}'
-                AND recommendation_timestamp >= DATEADD(day, -30, CURRENT_TIMESTAMP())
-                AND was_assigned = TRUE
-            """
+        csm_names_str = "', '".join(csm_list)
+        query = f"""
+        SELECT
+            recommended_csm as csm_name,
+            COUNT(DISTINCT account_id) as accounts_assigned_30d,
+            AVG(neediness_score) as avg_neediness_assigned,
+            SUM(CASE WHEN neediness_score >= 8 THEN 1 ELSE 0 END) as high_neediness_count,
+            COUNT(DISTINCT DATE(recommendation_timestamp)) as active_days,
+            MAX(neediness_score) as max_neediness_assigned,
+            MIN(neediness_score) as min_neediness_assigned
+        FROM {self.recommendations_table}
+        WHERE recommended_csm IN ('{csm_names_str}')
+            AND recommendation_timestamp >= DATEADD(day, -30, CURRENT_TIMESTAMP())
+            AND was_assigned = TRUE
+        GROUP BY recommended_csm
+        """
 
-            try:
-                df = self.execute_query(query)
-                if not df.empty:
-                    performance_data[csm] = convert_numpy_types(df.iloc[0].to_dict())
-                else:
-                    performance_data[csm] = {
-                        'accounts_assigned_30d': 0,
-                        'avg_neediness_assigned': 0,
-                        'high_neediness_count': 0,
-                        'active_days': 0
-                    }
-            except Exception as e:
-                logger.error(f"Failed to get historical data for {csm}: {str(e)}")
-                performance_data[csm] = {}
+        try:
+            df = self.execute_query(query)
+        except Exception as e:
+            logger.error(f"Failed to get historical data for {len(csm_list)} CSMs: {str(e)}")
+            return {csm: {} for csm in csm_list}
+
+        performance_data = {
+            csm: {
+                'accounts_assigned_30d': 0,
+                'avg_neediness_assigned': 0,
+                'high_neediness_count': 0,
+                'active_days': 0
+            }
+            for csm in csm_list
+        }
+        if not df.empty:
+            df.columns = [col.lower() for col in df.columns]
+            for row in df.to_dict('records'):
+                csm = row.pop('csm_name')
+                if csm in performance_data:
+                    performance_data[csm] = convert_numpy_types(row)
 
         return performance_data
 
@@ -1707,7 +3584,10 @@ class CSMRoutingAutomation:
         return metrics
 
     def _identify_potential_issues(self, analysis: Dict, metrics: Dict) -> list:
-        """Identify potential issues with the assignments"""
+        """
+        Identify potential issues with the assignments.
+        Issues about specific accounts list them in account_ids; the rest concern the whole batch.
+        """
         issues = []
 
         # Check workload balance
@@ -1736,17 +3616,17 @@ class CSMRoutingAutomation:
             })
 
         # Check for CSMs getting too many accounts in this batch
-        csm_assignment_counts = {}
+        csm_batch_accounts = {}
         for assignment in analysis['assignments']:
-            csm = assignment['assigned_csm']
-            csm_assignment_counts[csm] = csm_assignment_counts.get(csm, 0) + 1
+            csm_batch_accounts.setdefault(assignment['assigned_csm'], []).append(assignment['account_id'])
 
-        for csm, count in csm_assignment_counts.items():
-            if count > 3:
+        for csm, account_ids in csm_batch_accounts.items():
+            if len(account_ids) > 3:
                 issues.append({
                     'type': 'BATCH_CONCENTRATION',
                     'severity': 'MEDIUM',
-                    'detail': f"{csm} is getting {count} accounts in this batch (recommended max: 3)"
+                    'detail': f"{csm} is getting {len(account_ids)} accounts in this batch (recommended max: 3)",
+                    'account_ids': account_ids
                 })
 
         # Check health distribution issues
@@ -1759,193 +3639,522 @@ class CSMRoutingAutomation:
                     issues.append({
                         'type': 'RED_ACCOUNT_CONCENTRATION',
                         'severity': 'MEDIUM',
-                        'detail': f"{csm} already has {red_pct:.1f}% Red accounts and is getting another Red account"
+                        'detail': f"{csm} already has {red_pct:.1f}% Red accounts and is getting another Red account",
+                        'account_ids': [assignment['account_id']]
                     })
 
         return issues
 
-    def review_assignments_with_llm(self, assignments: Dict, accounts_df: pd.DataFrame, csm_books: Dict, excluded_csms: list = None) -> Tuple[bool, str, Dict]:
+    def build_review_prompt(self, sections: Dict, batch_size: int) -> str:
         """
-        Comprehensive LLM review with detailed context and specific evaluation criteria
-        Returns: (should_rerun, feedback_message, revised_assignments)
+        Per-batch part of the LLM review prompt from the compiled payload sections.
+        The fixed criteria, response schema and reassignment rules are LLM_REVIEW_RUBRIC.
         """
-        if not self.claude_client:
-            logger.info("LLM client not available, skipping review")
-            return False, "LLM review skipped - no API key", assignments
-
-        try:
-            # Gather comprehensive assignment details
-            assignment_analysis = self._prepare_assignment_analysis(assignments, accounts_df, csm_books)
+        return f"""Review these {batch_size} account assignments.
 
-            # Get historical performance data
-            historical_data = self._get_historical_performance_data(assignments.values())
+## EXCLUDED CSMS:
+{sections['excluded_csms']}
 
-            # Calculate detailed metrics
-            metrics_analysis = self._calculate_detailed_metrics(assignments, accounts_df, csm_books)
-
-            # Identify potential issues
-            issues = self._identify_potential_issues(assignment_analysis, metrics_analysis)
-
-            # Prepare alternatives for each account
-            alternatives_info = {}
-            if hasattr(self, 'assignment_alternatives'):
-                for account_id, alternatives in self.assignment_alternatives.items():
-                    if alternatives:
-                        # Get top 5 alternatives (or fewer if not available)
-                        top_5 = alternatives[:5]
-                        alternatives_info[account_id] = [
-                            {
-                                'csm': alt['csm'],
-                                'score': round(alt['score'], 2),
-                                'current_accounts': alt['current_accounts'],
-                                'recent_24h': alt['recent_assignments_24h'],
-                                'health_mix': alt['health_dist']
-                            }
-                            for alt in top_5
-                        ]
-
-            # Create comprehensive prompt for Claude
-            prompt = f"""You are an expert CSM routing analyst. Conduct a thorough review of these account assignments.
-
-## IMPORTANT: EXCLUDED CSMS
-The following CSMs have recent assignments and should NOT be suggested as alternatives:
-{json.dumps(excluded_csms if excluded_csms else [], indent=2)}
-
-## TOP ALTERNATIVE CSM OPTIONS FOR EACH ACCOUNT:
-{json.dumps(convert_numpy_types(alternatives_info), indent=2)}
-
-**Note**: The CSMs are ranked by optimization score (lower is better). The first CSM in each list is the current assignment.
-You should ONLY suggest changes if there's a significantly better alternative from this list.
-Choose from these top 5 alternatives to ensure diversity and avoid repeatedly assigning the same CSMs.
+## TOP ALTERNATIVE CSM OPTIONS:
+{sections['alternatives']}
 
 ## NEW ASSIGNMENTS DETAIL:
-{json.dumps(convert_numpy_types(assignment_analysis['assignments']), indent=2)}
+{sections['assignments']}
 
 ## PRE-ASSIGNMENT CSM BOOK ANALYSIS:
-{json.dumps(convert_numpy_types(assignment_analysis['book_stats']), indent=2)}
+{sections['book_stats']}
 
 ## POST-ASSIGNMENT PROJECTED METRICS:
-{json.dumps(convert_numpy_types(metrics_analysis['projected']), indent=2)}
+{sections['projected_metrics']}
 
 ## HEALTH SCORE DISTRIBUTION:
-Before Assignment:
-{json.dumps(convert_numpy_types(assignment_analysis['health_distribution']), indent=2)}
+{sections['projected_health']}
 
-After Assignment:
-{json.dumps(convert_numpy_types(metrics_analysis['projected_health']), indent=2)}
-
-## HISTORICAL CSM PERFORMANCE (Last 30 Days):
-{json.dumps(convert_numpy_types(historical_data), indent=2)}
+## HISTORICAL CSM PERFORMANCE:
+{sections['historical']}
 
 ## IDENTIFIED CONCERNS:
-{json.dumps(convert_numpy_types(issues), indent=2)}
+{sections['issues']}"""
 
-## SPECIFIC EVALUATION CRITERIA:
+    def count_prompt_tokens(self, prompt: str) -> Tuple[int, bool]:
+        """
+        Input tokens of a review prompt, rubric system block included, from the token counting API.
+        Returns (tokens, measured) - falls back to a character estimate when counting fails.
+        """
+        model = self.scoring_rules.get('llm_review', {}).get('model', 'claude-3-5-sonnet-20241022')
+        try:
+            count = self.claude_client.messages.count_tokens(model=model, system=self.review_system_blocks(),
+                                                              messages=[{"role": "user", "content": prompt}])
+            return count.input_tokens, True
+        except Exception as e:
+            logger.warning(f"Token counting failed, estimating from prompt length: {str(e)}")
+            return (len(LLM_REVIEW_RUBRIC) + len(prompt)) // LLM_CHARS_PER_TOKEN, False
+
+    def count_rubric_tokens(self) -> int:
+        """Tokens of the rubric system block (with a one-character message), counted once per process"""
+        if self.review_rubric_tokens is None:
+            self.review_rubric_tokens, _ = self.count_prompt_tokens('.')
+        return self.review_rubric_tokens
+
+    def compile_review_payload(self, assignments: Dict, assignment_analysis: Dict, metrics_analysis: Dict,
+                               historical_data: Dict, issues: list, excluded_csms: list = None,
+                               dynamic_tokens_per_char: float = None) -> Tuple[str, Dict]:
+        """
+        Compact LLM review prompt that scales with the batch, not the team.
+        Only CSMs that are assigned or appear as alternatives are sent, tables go as CSV and
+        objects as minified JSON. If the measured prompt exceeds llm_review.prompt_token_budget,
+        the lowest-priority context is dropped step by step (the rubric as a fixed cost plus the
+        per-batch part at its measured tokens per character) and the prompt is measured again,
+        continuing while it is still over budget.
 
-1. **Workload Balance** (Critical):
-   - Is the standard deviation of account counts > 20% of mean?
-   - Are any CSMs getting > 3 accounts in this batch?
-   - Will any CSM exceed their maximum capacity (from config)?
+        dynamic_tokens_per_char (the 'dynamic_tokens_per_char' stat of an earlier measured payload)
+        replaces the token counting calls with an estimate at that rate.
 
-2. **CSM Tenure & Experience Matching** (Critical):
-   - Are Red accounts going to experienced CSMs (Senior/Expert)?
-   - Are new CSMs (<3 months) receiving appropriate accounts (preferably Green)?
-   - Are high neediness accounts (score >= 8) assigned to CSMs with 6+ months tenure?
-   - Is any new CSM getting more than 2 accounts in this batch?
+        Returns: (prompt, payload stats)
+        """
+        settings = self.scoring_rules.get('llm_review', {})
+        budget = settings.get('prompt_token_budget', 6000)
+        alternatives_per_account = settings.get('alternatives_per_account', 5)
+
+        assigned_csms = set(assignments.values())
+        alternative_rows = []
+        for account_id in assignments:
+            for rank, alt in enumerate(getattr(self, 'assignment_alternatives', {}).get(account_id) or [], start=1):
+                if rank > alternatives_per_account:
+                    break
+                health_mix = alt.get('health_dist') or {}
+                alternative_rows.append({
+                    'account_id': account_id,
+                    'rank': rank,
+                    'csm': alt['csm'],
+                    'score': alt['score'],
+                    'current_accounts': alt['current_accounts'],
+                    'recent_24h': alt['recent_assignments_24h'],
+                    'red': health_mix.get('Red', 0),
+                    'yellow': health_mix.get('Yellow', 0),
+                    'green': health_mix.get('Green', 0)
+                })
 
-3. **Health Score Color Matching** (High Priority):
-   - Red accounts should go to CSMs with tenure >= 12 months
-   - Green accounts can go to newer CSMs for development
-   - Yellow accounts need balanced distribution
-   - No CSM should have > 35% Red accounts after assignment
+        assignment_rows = []
+        for assignment in assignment_analysis['assignments']:
+            csm_state = {f"csm_{key}": value for key, value in assignment['csm_current_state'].items()
+                         if key != 'health_distribution'}
+            assignment_rows.append({'account_id': assignment['account_id'], 'assigned_csm': assignment['assigned_csm'],
+                                    **assignment['account_details'], **csm_state})
+
+        def book_rows(csms):
+            return [{'csm': stat['csm'], 'accounts': stat['accounts'], 'total_neediness': stat['total_neediness'],
+                     'avg_neediness': stat['avg_neediness'], 'total_revenue': stat['total_revenue'],
+                     **stat['health_distribution']}
+                    for stat in assignment_analysis['book_stats'] if stat['csm'] in csms]
+
+        def historical_rows(csms):
+            return [{'csm': csm, **data} for csm, data in historical_data.items() if csm in csms]
+
+        relevant_csms = assigned_csms | {row['csm'] for row in alternative_rows}
+        tables = {
+            'book_csms': relevant_csms,
+            'historical_csms': relevant_csms,
+            'alternative_rank': alternatives_per_account
+        }
 
-4. **Neediness Distribution** (High Priority):
-   - High neediness accounts (score >= 8) should go to Senior/Expert CSMs
-   - Is the neediness variance increasing by > 30%?
-   - Are junior CSMs protected from getting multiple high neediness accounts?
+        def compile_prompt():
+            sections = {
+                'excluded_csms': compact_json(excluded_csms or []),
+                'alternatives': compact_table([row for row in alternative_rows if row['rank'] <= tables['alternative_rank']]),
+                'assignments': compact_table(assignment_rows),
+                'book_stats': compact_table(book_rows(tables['book_csms'])),
+                'projected_metrics': compact_json(metrics_analysis['projected']),
+                'projected_health': compact_table([{'csm': csm, **health}
+                                                   for csm, health in metrics_analysis['projected_health'].items()]),
+                'historical': compact_table(historical_rows(tables['historical_csms'])),
+                'issues': compact_json(issues)
+            }
+            return self.build_review_prompt(sections, len(assignments))
+
+        # Lowest-priority context first
+        reductions = [
+            ('historical data for alternative-only CSMs', lambda: tables.update(historical_csms=assigned_csms)),
+            ('book stats for alternative-only CSMs', lambda: tables.update(book_csms=assigned_csms)),
+            ('alternatives beyond the top 3', lambda: tables.update(alternative_rank=min(3, tables['alternative_rank']))),
+            ('historical data', lambda: tables.update(historical_csms=set())),
+            ('alternatives beyond the top 1', lambda: tables.update(alternative_rank=1))
+        ]
+
+        # The rubric system block is a fixed cost; only the per-batch part shrinks with each reduction
+        rubric_tokens = self.count_rubric_tokens()
+
+        def measure(prompt):
+            if dynamic_tokens_per_char is None:
+                return self.count_prompt_tokens(prompt)
+            return int(round(rubric_tokens + len(prompt) * dynamic_tokens_per_char)), False
+
+        def tokens_per_char(prompt, prompt_tokens):
+            return max(prompt_tokens - rubric_tokens, 0) / max(len(prompt), 1)
+
+        prompt = compile_prompt()
+        prompt_tokens, measured = measure(prompt)
+        dropped = []
+        while prompt_tokens > budget and len(dropped) < len(reductions):
+            rate = dynamic_tokens_per_char or tokens_per_char(prompt, prompt_tokens)
+            # Reduce until the estimate fits, then confirm with a measurement
+            for description, reduce in reductions[len(dropped):]:
+                reduce()
+                prompt = compile_prompt()
+                dropped.append(description)
+                if rubric_tokens + len(prompt) * rate <= budget:
+                    break
+            prompt_tokens, measured = measure(prompt)
+
+        stats = {
+            'prompt_tokens': prompt_tokens,
+            'measured': measured,
+            'dynamic_tokens_per_char': dynamic_tokens_per_char or tokens_per_char(prompt, prompt_tokens),
+            'token_budget': budget,
+            'csms': len(tables['book_csms']),
+            'accounts': len(assignments),
+            'dropped': dropped
+        }
+        log = logger.warning if prompt_tokens > budget else logger.info
+        log(f"LLM review payload: {prompt_tokens} {'measured' if measured else 'estimated'} tokens "
+            f"(budget {budget}) for {len(assignments)} accounts and {stats['csms']} CSMs"
+            + (f", dropped {', '.join(dropped)}" if dropped else ""))
+        return prompt, stats
 
-5. **Batch Assignment Logic** (High Priority for Multi-Account):
-   - In batch of {len(assignments)} accounts, evaluate collective impact
-   - Check if any single CSM is receiving too many accounts (max 3 per batch)
-   - Ensure batch doesn't overload new/junior CSMs
-   - Verify health score mix in batch is appropriate for each CSM's experience
+    def prescreen_assignments(self, assignments: Dict, issues: list) -> Dict:
+        """
+        Rule pre-screen ahead of the LLM review. Issues below llm_review.prescreen.escalate_severity
+        are ignored; a batch with none left is approved without the LLM. When every remaining issue
+        names its accounts, only those accounts are escalated.
 
-6. **Revenue Distribution** (Medium Priority):
-   - High-value accounts ($100k+) should go to experienced CSMs
-   - Are enterprise accounts being assigned to CSMs with 12+ months tenure?
+        Returns: the assignments to send to the LLM ({} = approve the batch as is)
+        """
+        settings = self.scoring_rules.get('llm_review', {}).get('prescreen', {})
+        if not settings.get('enabled', False):
+            return assignments
+
+        threshold = ISSUE_SEVERITY_LEVELS.index(settings.get('escalate_severity', 'MEDIUM'))
+        flagged = [issue for issue in issues
+                   if ISSUE_SEVERITY_LEVELS.index(issue.get('severity', 'CRITICAL')) >= threshold]
+        if not flagged:
+            return {}
+        if any(not issue.get('account_ids') for issue in flagged):
+            return assignments
 
-7. **Recent Assignment Pattern** (Medium Priority):
-   - Has any CSM received > 5 assignments in last 7 days?
-   - Are new CSMs (<3 months) getting > 2 assignments in 24 hours?
-   - Cooling period more important for junior CSMs
+        flagged_accounts = {account_id for issue in flagged for account_id in issue['account_ids']}
+        return {account_id: csm for account_id, csm in assignments.items() if account_id in flagged_accounts}
 
-8. **Special Considerations**:
-   - Parent/child account relationships maintained?
-   - Industry expertise matched where applicable?
-   - Timezone alignment considered?
+    def review_cache_key(self, assignments: Dict, accounts_df: pd.DataFrame, csm_books: Dict,
+                         assignment_analysis: Dict, historical_data: Dict, excluded_csms: list = None) -> str:
+        """
+        Content hash of everything an LLM review decision depends on: the model settings,
+        the assignment set with the assigned accounts' attributes, the batch's alternatives,
+        the book stats of every CSM involved, the assigned CSMs' 7-day recency, the live
+        health mix and 30-day history of the involved CSMs, the excluded CSMs, and the
+        review prompt itself (rubric, per-batch template and LLM_REVIEW_PROMPT_VERSION).
+        Canonical JSON (sorted keys, rounded scores) so equal contexts always hash the same.
+        """
+        alternatives = {
+            account_id: [(alt['csm'], round(float(alt['score']), 4), alt['current_accounts'], alt['recent_assignments_24h'],
+                          sorted((alt.get('health_dist') or {}).items()))
+                         for alt in getattr(self, 'assignment_alternatives', {}).get(account_id) or []]
+            for account_id in assignments
+        }
+        involved_csms = set(assignments.values()) | {alt[0] for alts in alternatives.values() for alt in alts}
+        account_fields = [col for col in ['neediness_score', 'health_segment', 'revenue', 'tad_score', 'segment']
+                          if col in accounts_df.columns]
+        accounts = accounts_df[accounts_df['account_id'].isin(list(assignments))].drop_duplicates('account_id')
+        book_fields = ['count', 'total_neediness', 'total_revenue', 'health_distribution', 'tenure_months']
+
+        # The per-batch template rendered with empty sections, so wording changes alter the key
+        template = self.build_review_prompt(defaultdict(str), 0)
+        context = {
+            'prompt': {
+                'rubric': hashlib.sha256(LLM_REVIEW_RUBRIC.encode('utf-8')).hexdigest(),
+                'template': hashlib.sha256(template.encode('utf-8')).hexdigest(),
+                'version': LLM_REVIEW_PROMPT_VERSION
+            },
+            'llm_review': {key: value for key, value in self.scoring_rules.get('llm_review', {}).items() if key != 'cache'},
+            'assignments': sorted(assignments.items()),
+            'accounts': accounts.set_index('account_id')[account_fields].sort_index().to_dict('index'),
+            'alternatives': alternatives,
+            'books': {csm: {field: csm_books.get(csm, {}).get(field) for field in book_fields} for csm in sorted(involved_csms)},
+            'recency': {assignment['assigned_csm']: (assignment['csm_current_state']['recent_assignments_7d'],
+                                                     assignment['csm_current_state']['recent_high_neediness'])
+                        for assignment in assignment_analysis['assignments'] if assignment['account_id'] in assignments},
+            'health_distributions': {csm: health for csm, health in assignment_analysis['health_distribution'].items()
+                                     if csm in involved_csms},
+            'historical': {csm: data for csm, data in historical_data.items() if csm in involved_csms},
+            'excluded_csms': sorted(excluded_csms or [])
+        }
+        canonical = json.dumps(convert_numpy_types(context), sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
 
-## YOUR TASK:
-1. Analyze each criterion systematically
-2. Identify SPECIFIC problems (not general observations)
-3. Only disapprove if there are SIGNIFICANT imbalances that would harm customer experience
-4. Consider cumulative effect of assignments, not just individual ones
+    def get_cached_review(self, cache_key: str) -> Optional[Dict]:
+        """Stored LLM review decision for a context hash, or None if missing, expired or disabled"""
+        settings = self.scoring_rules.get('llm_review', {}).get('cache', {})
+        if not settings.get('enabled', False):
+            return None
 
-Respond with a JSON object:
-{{
-    "approve": true/false,
-    "confidence_score": 0-100 (how confident you are in this decision),
-    "feedback": "Specific 1-2 sentence explanation of your decision",
-    "critical_issues": ["List of critical problems requiring immediate rebalancing"],
-    "warnings": ["List of non-critical concerns to monitor"],
-    "specific_reassignments": {{"account_id": "suggested_csm"}} or null,  // IMPORTANT: You MUST select from the TOP ALTERNATIVE CSM OPTIONS provided above! Pick the 2nd, 3rd, 4th, or 5th best alternative to ensure diversity. Do NOT suggest any CSM from the EXCLUDED CSMS list!
-    "metrics_summary": {{
-        "workload_balance": "good/fair/poor",
-        "neediness_distribution": "good/fair/poor",
-        "health_balance": "good/fair/poor",
-        "overall_quality": "good/fair/poor"
-    }}
-}}
+        path = os.path.join(settings.get('directory', 'llm_review_cache'), f"{cache_key}.json")
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        age_minutes = (time.time() - entry.get('cached_at', 0)) / 60
+        if age_minutes > settings.get('ttl_minutes', 60):
+            logger.info(f"LLM review cache entry {cache_key[:12]} expired ({age_minutes:.0f} min old)")
+            return None
+        return entry.get('review_result')
+
+    def store_cached_review(self, cache_key: str, review_result: Dict):
+        """Store an LLM review decision under its context hash (atomic write)"""
+        settings = self.scoring_rules.get('llm_review', {}).get('cache', {})
+        if not settings.get('enabled', False):
+            return
 
-CRITICAL RULES FOR REASSIGNMENTS:
-1. You MUST ONLY suggest CSMs from the "TOP ALTERNATIVE CSM OPTIONS" section above
-2. Prefer the 2nd, 3rd, or 4th best alternatives over the 1st to ensure diversity
-3. If the same CSM appears as #1 for multiple accounts, distribute to alternatives
-4. NEVER suggest CSMs from the EXCLUDED CSMS list
-5. If no good alternative exists in the top 5, approve the original assignment
+        directory = settings.get('directory', 'llm_review_cache')
+        path = os.path.join(directory, f"{cache_key}.json")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(f"{path}.tmp", 'w') as f:
+                json.dump({'cached_at': time.time(), 'review_result': convert_numpy_types(review_result)}, f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning(f"Failed to store LLM review in cache: {str(e)}")
+
+    def review_system_blocks(self) -> list:
+        """System prompt with the static review rubric, marked for prompt caching when enabled"""
+        block = {"type": "text", "text": LLM_REVIEW_RUBRIC}
+        if self.scoring_rules.get('llm_review', {}).get('prompt_caching', True):
+            block["cache_control"] = {"type": "ephemeral"}
+        return [block]
+
+    def review_request(self, prompt: str) -> Dict:
+        """messages.create arguments for a review prompt: cached rubric system block plus per-batch data"""
+        llm_settings = self.scoring_rules.get('llm_review', {})
+        return {
+            'model': llm_settings.get('model', 'claude-3-5-sonnet-20241022'),
+            'max_tokens': llm_settings.get('max_tokens', 1500),
+            'temperature': llm_settings.get('temperature', 0.1),  # Slightly higher for more nuanced analysis
+            'system': self.review_system_blocks(),
+            'messages': [
+                {"role": "user", "content": prompt}
+            ]
+        }
 
-Be specific and actionable. Default to approval unless there are clear, significant problems."""
+    def record_review_usage(self, response, seconds: float):
+        """Record token usage and prompt cache hit/write of one review call"""
+        usage = getattr(response, 'usage', None)
+        cache_read = getattr(usage, 'cache_read_input_tokens', None) or 0
+        cache_write = getattr(usage, 'cache_creation_input_tokens', None) or 0
+        entry = {
+            'input_tokens': getattr(usage, 'input_tokens', None) or 0,
+            'output_tokens': getattr(usage, 'output_tokens', None) or 0,
+            'cache_read_input_tokens': cache_read,
+            'cache_creation_input_tokens': cache_write,
+            'cache_hit': cache_read > 0,
+            'seconds': seconds
+        }
+        self.review_usage_history.append(entry)
 
-            # Call Claude Sonnet with higher token limit for detailed analysis
-            response = self.claude_client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1500,
-                temperature=0.1,  # Slightly higher for more nuanced analysis
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
+        hits = sum(1 for call in self.review_usage_history if call['cache_hit'])
+        logger.info(f"LLM review call: {entry['input_tokens']} uncached input tokens, {cache_read} read from prompt cache, "
+                    f"{cache_write} written to prompt cache, {entry['output_tokens']} output tokens in {seconds:.2f}s "
+                    f"(cache hits {hits}/{len(self.review_usage_history)} calls)")
 
-            # Parse response
-            response_text = response.content[0].text
-            logger.debug(f"LLM Response: {response_text[:500]}...")
+    def parse_review_response(self, response_text: str) -> Optional[Dict]:
+        """Review decision JSON from an LLM response, or None if it could not be parsed"""
+        logger.debug(f"LLM Response: {response_text[:500]}...")
+
+        # Extract JSON with better error handling
+        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+        if json_match:
+            try:
+                return json.loads(json_match.group())
+            except ValueError:
+                pass
+        logger.error("Failed to parse LLM JSON response")
+        return None
 
-            # Extract JSON with better error handling
-            import re
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                review_result = json.loads(json_match.group())
+    def chunk_review_assignments(self, assignments: Dict, chunk_size: int) -> List[Dict]:
+        """
+        Split assignments into review chunks of at most chunk_size accounts (first-fit by
+        CSM, largest first) so each CSM's batch accounts are reviewed together. A CSM with
+        more than chunk_size accounts gets a chunk of its own.
+        """
+        by_csm = {}
+        for account_id, csm in assignments.items():
+            by_csm.setdefault(csm, {})[account_id] = csm
+
+        chunks = []
+        for group in sorted(by_csm.values(), key=len, reverse=True):
+            chunk = next((chunk for chunk in chunks if len(chunk) + len(group) <= chunk_size), None)
+            if chunk is None:
+                chunks.append(dict(group))
             else:
-                logger.error("Failed to parse LLM JSON response")
-                review_result = {
-                    "approve": True,
-                    "confidence_score": 0,
-                    "feedback": "Could not parse LLM response, proceeding with assignments",
-                    "critical_issues": [],
-                    "warnings": ["LLM response parsing failed"],
-                    "specific_reassignments": None,
-                    "metrics_summary": {}
+                chunk.update(group)
+        return chunks
+
+    def merge_review_results(self, results: list) -> Dict:
+        """
+        Combine chunk review decisions: approved only if every chunk approves, lowest confidence,
+        issues, warnings and reassignments pooled, worst rating per quality metric
+        """
+        if len(results) == 1:
+            return results[0]
+
+        ratings = ['good', 'fair', 'poor']
+        metrics_summary = {}
+        for result in results:
+            for metric, rating in (result.get('metrics_summary') or {}).items():
+                current = metrics_summary.get(metric)
+                if current is None or (rating in ratings and current in ratings and ratings.index(rating) > ratings.index(current)):
+                    metrics_summary[metric] = rating
+
+        reassignments = {}
+        for result in results:
+            reassignments.update(result.get('specific_reassignments') or {})
+
+        return {
+            'approve': all(result.get('approve', True) for result in results),
+            'confidence_score': min(result.get('confidence_score', 100) for result in results),
+            'feedback': ' | '.join(result['feedback'] for result in results if result.get('feedback')),
+            'critical_issues': [issue for result in results for issue in result.get('critical_issues') or []],
+            'warnings': [warning for result in results for warning in result.get('warnings') or []],
+            'specific_reassignments': reassignments or None,
+            'metrics_summary': metrics_summary
+        }
+
+    def create_async_claude_client(self):
+        """Async Anthropic client with the same credentials as the sync one"""
+        return anthropic.AsyncAnthropic(api_key=self.claude_client.api_key)
+
+    async def review_prompts_concurrently(self, prompts: list) -> list:
+        """
+        Send review prompts concurrently, at most llm_review.concurrency.max_concurrency in
+        flight and request starts spaced to stay under requests_per_minute.
+        Returns one parsed decision per prompt (None where the call or parsing failed).
+        """
+        settings = self.scoring_rules.get('llm_review', {}).get('concurrency', {})
+        semaphore = asyncio.Semaphore(settings.get('max_concurrency', 4))
+        requests_per_minute = settings.get('requests_per_minute')
+        start_interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        start_lock = asyncio.Lock()
+        next_start = 0.0
+
+        async def review(client, chunk_number, prompt):
+            nonlocal next_start
+            async with semaphore:
+                async with start_lock:
+                    loop = asyncio.get_running_loop()
+                    if next_start > loop.time():
+                        await asyncio.sleep(next_start - loop.time())
+                    next_start = loop.time() + start_interval
+                try:
+                    start_time = time.time()
+                    response = await client.messages.create(**self.review_request(prompt))
+                    self.record_review_usage(response, time.time() - start_time)
+                except Exception as e:
+                    logger.error(f"LLM review of chunk {chunk_number} failed: {str(e)}")
+                    return None
+                return self.parse_review_response(response.content[0].text)
+
+        client = self.create_async_claude_client()
+        try:
+            return await asyncio.gather(*(review(client, number, prompt) for number, prompt in enumerate(prompts, start=1)))
+        finally:
+            await client.close()
+
+    def review_assignments_with_llm(self, assignments: Dict, accounts_df: pd.DataFrame, csm_books: Dict, excluded_csms: list = None) -> Tuple[bool, str, Dict]:
+        """
+        Comprehensive LLM review with detailed context and specific evaluation criteria
+        Returns: (should_rerun, feedback_message, revised_assignments)
+        """
+        if not self.claude_client:
+            logger.info("LLM client not available, skipping review")
+            return False, "LLM review skipped - no API key", assignments
+
+        try:
+            llm_settings = self.scoring_rules.get('llm_review', {})
+
+            # Gather comprehensive assignment details
+            assignment_analysis = self._prepare_assignment_analysis(assignments, accounts_df, csm_books)
+
+            # Calculate detailed metrics
+            metrics_analysis = self._calculate_detailed_metrics(assignments, accounts_df, csm_books)
+
+            # Identify potential issues
+            issues = self._identify_potential_issues(assignment_analysis, metrics_analysis)
+
+            # Rule pre-screen: clean batches skip the LLM, account-level issues escalate only those accounts
+            review_assignments = self.prescreen_assignments(assignments, issues)
+            if not review_assignments:
+                severity = llm_settings.get('prescreen', {}).get('escalate_severity', 'MEDIUM')
+                logger.info(f"Rule pre-screen approved {len(assignments)} assignments - no issues at {severity} severity or above")
+                return False, f"Auto-approved by rule pre-screen (no issues at {severity} severity or above)", assignments
+            if len(review_assignments) < len(assignments):
+                logger.info(f"Rule pre-screen escalating {len(review_assignments)} of {len(assignments)} accounts to LLM review")
+                assignment_analysis = {
+                    **assignment_analysis,
+                    'assignments': [assignment for assignment in assignment_analysis['assignments']
+                                    if assignment['account_id'] in review_assignments]
                 }
 
+            # Get historical performance data
+            historical_data = self._get_historical_performance_data(review_assignments.values())
+
+            # Identical review contexts (recency and history included) reuse the stored decision without a model call
+            cache_key = self.review_cache_key(review_assignments, accounts_df, csm_books, assignment_analysis,
+                                              historical_data, excluded_csms)
+            review_result = self.get_cached_review(cache_key)
+            if review_result is not None:
+                logger.info(f"LLM review cache hit ({cache_key[:12]}) - reusing stored decision")
+            else:
+                # Large batches are split into chunks (each CSM's accounts together) reviewed concurrently
+                chunk_size = llm_settings.get('concurrency', {}).get('chunk_size', 25)
+                chunks = [review_assignments]
+                if len(review_assignments) > chunk_size:
+                    chunks = self.chunk_review_assignments(review_assignments, chunk_size)
+
+                # Compact, token-budgeted prompt covering only the CSMs each chunk touches; the first
+                # measured chunk's tokens per character sizes the rest without further counting calls
+                prompts = []
+                dynamic_tokens_per_char = None
+                for chunk in chunks:
+                    chunk_analysis = {
+                        **assignment_analysis,
+                        'assignments': [assignment for assignment in assignment_analysis['assignments']
+                                        if assignment['account_id'] in chunk]
+                    }
+                    chunk_issues = [issue for issue in issues
+                                    if not issue.get('account_ids') or any(account_id in chunk for account_id in issue['account_ids'])]
+                    prompt, payload_stats = self.compile_review_payload(
+                        chunk, chunk_analysis, metrics_analysis, historical_data, chunk_issues, excluded_csms,
+                        dynamic_tokens_per_char=dynamic_tokens_per_char
+                    )
+                    if payload_stats['measured']:
+                        dynamic_tokens_per_char = payload_stats['dynamic_tokens_per_char']
+                    prompts.append(prompt)
+
+                if len(prompts) == 1:
+                    # Call Claude Sonnet with higher token limit for detailed analysis
+                    start_time = time.time()
+                    response = self.claude_client.messages.create(**self.review_request(prompts[0]))
+                    self.record_review_usage(response, time.time() - start_time)
+                    results = [self.parse_review_response(response.content[0].text)]
+                else:
+                    logger.info(f"Reviewing {len(review_assignments)} accounts in {len(prompts)} concurrent chunks of up to {chunk_size}")
+                    results = asyncio.run(self.review_prompts_concurrently(prompts))
+
+                review_result = self.merge_review_results([
+                    result if result is not None else copy.deepcopy(UNPARSED_REVIEW_RESULT) for result in results
+                ])
+                if all(result is not None for result in results):
+                    self.store_cached_review(cache_key, review_result)
+
             # Log detailed feedback
             logger.info(f"LLM Decision: {'APPROVED' if review_result.get('approve') else 'REJECTED'}")
             logger.info(f"Confidence Score: {review_result.get('confidence_score', 0)}%")
@@ -2228,6 +4437,9 @@ Be specific and actionable. Default to approval unless there are clear, signific
             test_limit: Optional limit on number of accounts to process (for testing)
         """
         logger.info("Starting CSM Routing Automation")
+
+        # Health distributions are cached per run - the daemon loop must see fresh data
+        self.health_distribution_cache = None
         if test_limit:
             logger.info(f"TEST MODE: Limited to {test_limit} account(s)")
 
@@ -2281,6 +4493,7 @@ Be specific and actionable. Default to approval unless there are clear, signific
             retry_count = 0
             llm_feedback = None
             run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.start_score_audit(run_id)
 
             while retry_count <= max_retries:
                 # Clear previous assignments if this is a retry
@@ -2321,34 +4534,17 @@ Be specific and actionable. Default to approval unless there are clear, signific
                         csm_books[csm]['total_tad'] += account.get('tad_score', 0)
                 else:
                     # Multiple accounts - use PuLP optimization
-                    logger.info(f"Processing {len(resi_corp_df)} accounts with PuLP optimization")
-                    assignments = self.optimize_batch_with_pulp(resi_corp_df, csm_books, excluded_csms=recently_assigned)
+                    if self.use_rolling_horizon(resi_corp_df, csm_books, excluded_csms=recently_assigned):
+                        logger.info(f"Processing backlog of {len(resi_corp_df)} accounts with rolling-horizon PuLP optimization")
+                        assignments = self.optimize_backlog_rolling_horizon(resi_corp_df, csm_books, excluded_csms=recently_assigned)
+                    else:
+                        logger.info(f"Processing {len(resi_corp_df)} accounts with PuLP optimization")
+                        assignments = self.optimize_batch_with_pulp(resi_corp_df, csm_books, excluded_csms=recently_assigned)
 
                     # Fallback: If PuLP optimization fails, process accounts one by one
                     if not assignments:
                         logger.warning("PuLP optimization failed or returned no assignments. Falling back to individual assignment...")
-                        assignments = {}
-                        for _, account in resi_corp_df.iterrows():
-                            # Update exclusion list to include CSMs already assigned in this batch
-                            current_exclusions = recently_assigned.copy()
-                            if assignments:
-                                current_exclusions.extend(list(set(assignments.values())))
-
-                            csm, score, top_alternatives = self.assign_single_account_optimized(account, csm_books, excluded_csms=current_exclusions)
-                            if csm:
-                                assignments[account['account_id']] = csm
-                                # Store alternatives for LLM review
-                                if not hasattr(self, 'assignment_alternatives'):
-                                    self.assignment_alternatives = {}
-                                self.assignment_alternatives[account['account_id']] = top_alternatives
-                                # Update the csm_books for next account
-                                csm_books[csm]['count'] += 1
-                                csm_books[csm]['total_neediness'] += account.get('neediness_score', 0)
-                                csm_books[csm]['total_revenue'] += account.get('revenue', 0)
-                                csm_books[csm]['total_tad'] += account.get('tad_score', 0)
-                                logger.info(f"Assigned {account['account_id']} to {csm} (fallback mode)")
-                            else:
-                                logger.warning(f"Could not assign account {account['account_id']} - all CSMs at capacity")
+                        assignments = self.assign_accounts_sequentially(resi_corp_df, csm_books, excluded_csms=recently_assigned)
 
                 # Review assignments with LLM
                 logger.info(f"DEBUG: Assignments ready for review: {len(assignments) if assignments else 0}")
@@ -2428,6 +4624,10 @@ Be specific and actionable. Default to approval unless there are clear, signific
             # Generate balance report
             self.generate_balance_report(csm_books)
 
+            # Persist candidate score breakdowns for offline audit (off unless score_audit.enabled)
+            if self.scoring_rules.get('score_audit', {}).get('enabled', False):
+                self.persist_score_audit()
+
         except Exception as e:
             logger.error(f"Error during execution: {str(e)}")
             raise
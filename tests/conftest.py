@@ -0,0 +1,98 @@
+"""
+Offline fixtures for csm_routing_automation: synthetic CSM books and a stand-in
+Snowflake connection that accepts every statement and returns no rows.
+Run with: python -m pytest tests
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csm_routing_automation as routing  # noqa: E402
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'csm_scoring_rules.json')
+
+
+class EmptyCursor:
+    """Cursor that accepts every statement and returns no rows"""
+
+    def execute(self, query):
+        return self
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def fetch_pandas_all(self):
+        return pd.DataFrame()
+
+    def close(self):
+        pass
+
+
+class EmptyConnection:
+    def cursor(self):
+        return EmptyCursor()
+
+    def commit(self):
+        pass
+
+
+def make_books(num_csms, count, seed=0):
+    """Synthetic Residential Corporate books, every CSM holding `count` accounts"""
+    rng = np.random.default_rng(seed)
+    tenure_categories = ['New', 'Junior', 'Mid', 'Senior', 'Expert']
+    books = {}
+    for i in range(num_csms):
+        red, yellow = int(rng.integers(5, 30)), int(rng.integers(5, 30))
+        books[f'csm_{i:02d}'] = {
+            'count': count,
+            'total_neediness': float(rng.integers(100, 500)),
+            'total_revenue': float(rng.uniform(1e6, 5e7)),
+            'total_tad': float(rng.uniform(0, 1e4)),
+            'health_distribution': {'Red': red, 'Yellow': yellow, 'Green': count - red - yellow, 'total': count},
+            'tenure_months': int(rng.integers(0, 36)),
+            'tenure_category': tenure_categories[int(rng.integers(0, 5))]
+        }
+    return books
+
+
+def make_accounts(num_accounts, seed=0):
+    """Synthetic 'Needs CSM' accounts"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'account_id': [f'acct_{i:03d}' for i in range(num_accounts)],
+        'health_segment': rng.choice(['Red', 'Yellow', 'Green'], num_accounts),
+        'neediness_score': rng.integers(1, 11, num_accounts).astype(float),
+        'revenue': rng.uniform(1e3, 1e5, num_accounts),
+        'tad_score': rng.uniform(0, 100, num_accounts),
+        'segment': 'Residential',
+        'account_level': 'Corporate'
+    })
+
+
+@pytest.fixture
+def make_automation(tmp_path, monkeypatch):
+    """Build a CSMRoutingAutomation over synthetic books without warehouse or API access"""
+    monkeypatch.chdir(tmp_path)
+
+    def build(books, max_accounts_per_csm=100):
+        config_file = tmp_path / 'properties.json'
+        limits_file = tmp_path / 'limits.json'
+        config_file.write_text('{}')
+        limits_file.write_text(json.dumps({'residential_corporate': {'max_accounts_per_csm': max_accounts_per_csm}}))
+
+        automation = routing.CSMRoutingAutomation(str(config_file), str(limits_file), RULES_FILE)
+        automation.snowflake_conn = EmptyConnection()
+        automation.eligible_csm_list = list(books)
+        automation.health_distribution_cache = {csm: dict(book['health_distribution']) for csm, book in books.items()}
+        return automation
+
+    return build
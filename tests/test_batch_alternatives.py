@@ -0,0 +1,21 @@
+from conftest import make_accounts, make_books
+
+
+def test_batch_alternatives_rank_assigned_csm_first_with_pre_batch_counts(make_automation):
+    books = make_books(20, 60)
+    books['csm_03']['count'] = 40
+    automation = make_automation(books, max_accounts_per_csm=100)
+    accounts = make_accounts(8)
+    pre_batch_counts = {csm: book['count'] for csm, book in books.items()}
+
+    assignments = automation.optimize_batch_with_pulp(accounts, books, store_recommendations=False)
+
+    assert set(assignments) == set(accounts['account_id'])
+    for account_id, csm in assignments.items():
+        alternatives = automation.assignment_alternatives[account_id]
+        assert alternatives[0]['csm'] == csm
+        assert alternatives[0]['score'] == 0.0
+        assert len({alt['csm'] for alt in alternatives}) == len(alternatives) == 6
+        for alt in alternatives:
+            assert alt['current_accounts'] == pre_batch_counts[alt['csm']]
+            assert alt['recency_penalty'] <= alt['pair_penalty']
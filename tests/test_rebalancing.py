@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+
+def make_book_frame(num_accounts=120, csms=('csm_0', 'csm_1', 'csm_2', 'csm_3', 'manager'), seed=5):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'account_id': [f'acct_{i:03d}' for i in range(num_accounts)],
+        'csm_name': [csms[i % len(csms)] for i in range(num_accounts)],
+        'health_segment': rng.choice(['Red', 'Yellow', 'Green'], num_accounts),
+        'neediness_score': rng.integers(0, 11, num_accounts).astype(float),
+        'segment': 'Residential',
+        'account_level': 'Corporate'
+    })
+
+
+def test_rebalance_respects_assignment_constraints_and_capacity(make_automation):
+    automation = make_automation({})
+    automation.eligible_csm_list = ['csm_0', 'csm_1', 'csm_2', 'csm_3']
+    automation.csm_book_frame = make_book_frame()
+    fixed = {'csm_2': ['acct_000', 'acct_001']}
+    restricted = {'csm_1': ['acct_006', 'acct_011'], 'csm_3': ['acct_008']}
+    parent_child = {'acct_010': ['acct_021', 'acct_032']}
+
+    rebalanced = automation.rebalance_csm_books(
+        fixed_assignments=fixed, restricted_assignments=restricted,
+        parent_child_accounts=parent_child, max_accounts_per_csm=31
+    )
+
+    new_csm = rebalanced.set_index('account_id')['new_csm_name']
+    assert new_csm.notna().all()
+    # Default roster is the eligible CSMs, never the manager in the raw book frame
+    assert set(new_csm) <= set(automation.eligible_csm_list)
+    assert new_csm['acct_000'] == new_csm['acct_001'] == 'csm_2'
+    assert new_csm['acct_006'] != 'csm_1' and new_csm['acct_011'] != 'csm_1'
+    assert new_csm['acct_008'] != 'csm_3'
+    assert new_csm['acct_010'] == new_csm['acct_021'] == new_csm['acct_032']
+    assert new_csm.value_counts().max() <= 31
+
+
+def test_rebalance_without_roster_or_eligible_csms_returns_empty(make_automation):
+    automation = make_automation({})
+    automation.eligible_csm_list = []
+
+    assert automation.rebalance_csm_books(make_book_frame()).empty
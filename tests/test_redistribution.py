@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+import csm_routing_automation as routing
+
+
+def test_local_search_leaves_accounts_unassigned_when_every_csm_is_full():
+    columns, _ = routing.local_search_redistribution(
+        np.full(3, 9.0), np.full(3, 40.0), np.full((3, 3), 3.0),
+        np.ones(5), np.zeros(5, dtype=int), np.full(3, 10.0), np.ones(4), seed=0
+    )
+
+    assert (columns < 0).sum() == 2
+    assert np.bincount(columns[columns >= 0], minlength=3).tolist() == [1, 1, 1]
+
+
+def test_redistribute_departing_book_respects_capacity_and_is_reproducible(make_automation):
+    rng = np.random.default_rng(3)
+    books_df = pd.DataFrame({
+        'account_id': [f'acct_{i:03d}' for i in range(240)],
+        'csm_name': [f'csm_{i % 8}' for i in range(240)],
+        'health_segment': rng.choice(['Red', 'Yellow', 'Green', None], 240),
+        'neediness_score': rng.integers(0, 11, 240).astype(float)
+    })
+    automation = make_automation({})
+    # csm_7 is in the book frame but not eligible (e.g. a manager), so it keeps its book and gains nothing
+    automation.eligible_csm_list = [f'csm_{i}' for i in range(7)]
+
+    first = automation.redistribute_departing_book('csm_0', books_df, max_accounts_per_csm=36, restarts=3, max_workers=1)
+    second = automation.redistribute_departing_book('csm_0', books_df, max_accounts_per_csm=36, restarts=3, max_workers=1)
+
+    assert first['new_csm_name'].notna().all()
+    assert (first['new_csm_name'] != 'csm_0').all()
+    assert first['new_csm_name'].value_counts().max() <= 36
+    assert (first['new_csm_name'] == 'csm_7').sum() == (books_df['csm_name'] == 'csm_7').sum()
+    assert first['new_csm_name'].equals(second['new_csm_name'])
@@ -0,0 +1,74 @@
+import json
+import types
+
+import csm_routing_automation as routing
+from conftest import make_accounts, make_books
+
+
+class ReviewMessages:
+    """Token counter and review model that approves every batch"""
+
+    def __init__(self):
+        self.create_calls = 0
+
+    def count_tokens(self, model, system, messages):
+        return types.SimpleNamespace(input_tokens=(len(system[0]['text']) + len(messages[0]['content'])) // 4)
+
+    def create(self, **request):
+        self.create_calls += 1
+        decision = {'approve': True, 'confidence_score': 90, 'feedback': 'Balanced', 'critical_issues': []}
+        return types.SimpleNamespace(content=[types.SimpleNamespace(text=json.dumps(decision))],
+                                     usage=types.SimpleNamespace(input_tokens=100, output_tokens=20))
+
+
+def test_review_cache_misses_when_history_or_recency_change(make_automation, tmp_path):
+    books = make_books(10, 60)
+    automation = make_automation(books)
+    messages = ReviewMessages()
+    automation.claude_client = types.SimpleNamespace(messages=messages)
+    settings = automation.scoring_rules['llm_review']
+    settings['cache'].update(enabled=True, directory=str(tmp_path / 'reviews'))
+    automation.prescreen_assignments = lambda assignments, issues: assignments
+    accounts = make_accounts(4)
+    assignments = {account_id: f'csm_0{i}' for i, account_id in enumerate(accounts['account_id'])}
+    automation.assignment_alternatives = {}
+
+    history = {'accounts_assigned_30d': 3, 'avg_neediness_assigned': 5.0, 'high_neediness_count': 0, 'active_days': 2}
+    automation._get_historical_performance_data = lambda csms: {csm: dict(history) for csm in csms}
+    recency = {'actual_assignments': 1, 'avg_neediness_assigned': 4.0}
+    automation.get_recent_recommendations_for_csms = lambda csms, hours: {csm: dict(recency) for csm in csms}
+
+    automation.review_assignments_with_llm(assignments, accounts, books)
+    automation.review_assignments_with_llm(assignments, accounts, books)
+    assert messages.create_calls == 1
+
+    history['accounts_assigned_30d'] = 4
+    automation.review_assignments_with_llm(assignments, accounts, books)
+    assert messages.create_calls == 2
+
+    recency['actual_assignments'] = 2
+    automation.review_assignments_with_llm(assignments, accounts, books)
+    assert messages.create_calls == 3
+
+
+def test_review_cache_key_changes_with_the_rubric_and_prompt_version(make_automation, monkeypatch):
+    books = make_books(10, 60)
+    automation = make_automation(books)
+    automation.assignment_alternatives = {}
+    accounts = make_accounts(4)
+    assignments = {account_id: f'csm_0{i}' for i, account_id in enumerate(accounts['account_id'])}
+    analysis = automation._prepare_assignment_analysis(assignments, accounts, books)
+    historical = automation._get_historical_performance_data(assignments.values())
+
+    def key():
+        return automation.review_cache_key(assignments, accounts, books, analysis, historical)
+
+    original = key()
+    assert key() == original
+
+    monkeypatch.setattr(routing, 'LLM_REVIEW_RUBRIC', routing.LLM_REVIEW_RUBRIC + '\n6. Never move Red accounts')
+    revised_rubric = key()
+    assert revised_rubric != original
+
+    monkeypatch.setattr(routing, 'LLM_REVIEW_PROMPT_VERSION', routing.LLM_REVIEW_PROMPT_VERSION + 1)
+    assert key() not in (original, revised_rubric)
@@ -0,0 +1,99 @@
+import types
+
+import pytest
+
+from conftest import make_accounts, make_books
+
+
+class CountingMessages:
+    """Token counter with different densities for the rubric and the per-batch data"""
+
+    def __init__(self):
+        self.count_calls = 0
+
+    def count_tokens(self, model, system, messages):
+        self.count_calls += 1
+        return types.SimpleNamespace(input_tokens=len(system[0]['text']) // 5 + len(messages[0]['content']) // 2)
+
+
+def review_inputs(automation, books, num_accounts=12):
+    accounts = make_accounts(num_accounts)
+    csms = list(books)
+    assignments = {account_id: csms[i % 4] for i, account_id in enumerate(accounts['account_id'])}
+    automation.assignment_alternatives = {
+        account_id: [
+            {'csm': csms[(i + rank) % len(csms)], 'score': 1.5 * rank, 'recency_penalty': 0.0,
+             'current_accounts': 60, 'health_dist': books[csms[(i + rank) % len(csms)]]['health_distribution'],
+             'recent_assignments_24h': 1}
+            for rank in range(5)
+        ]
+        for i, account_id in enumerate(accounts['account_id'])
+    }
+    analysis = automation._prepare_assignment_analysis(assignments, accounts, books)
+    metrics = automation._calculate_detailed_metrics(assignments, accounts, books)
+    historical = automation._get_historical_performance_data(assignments.values())
+    return assignments, analysis, metrics, historical
+
+
+@pytest.fixture
+def review_automation(make_automation):
+    books = make_books(30, 60)
+    automation = make_automation(books)
+    automation.claude_client = types.SimpleNamespace(messages=CountingMessages())
+    return automation, books
+
+
+def test_compile_review_payload_fits_budget_when_reducible(review_automation):
+    automation, books = review_automation
+    inputs = review_inputs(automation, books)
+    settings = automation.scoring_rules['llm_review']
+
+    settings['prompt_token_budget'] = 10 ** 6
+    _, full = automation.compile_review_payload(*inputs, [], None)
+    settings['prompt_token_budget'] = 0
+    _, smallest = automation.compile_review_payload(*inputs, [], None)
+    assert smallest['prompt_tokens'] < full['prompt_tokens']
+
+    for budget in range(smallest['prompt_tokens'], full['prompt_tokens'] + 1, 25):
+        settings['prompt_token_budget'] = budget
+        prompt, stats = automation.compile_review_payload(*inputs, [], None)
+        assert stats['measured']
+        assert stats['prompt_tokens'] <= budget, (budget, stats)
+
+
+def test_compile_review_payload_sends_only_involved_csms(review_automation):
+    automation, books = review_automation
+    assignments, analysis, metrics, historical = review_inputs(automation, books)
+    automation.scoring_rules['llm_review']['prompt_token_budget'] = 10 ** 6
+
+    prompt, stats = automation.compile_review_payload(assignments, analysis, metrics, historical, [], None)
+
+    involved = set(assignments.values()) | {alt['csm'] for account_id in assignments
+                                            for alt in automation.assignment_alternatives[account_id]}
+    assert stats['csms'] == len(involved) < len(books)
+    assert all(csm in prompt for csm in involved)
+
+
+def test_chunked_review_counts_tokens_once(review_automation):
+    automation, books = review_automation
+    accounts = make_accounts(60)
+    csms = list(books)
+    assignments = {account_id: csms[i % 30] for i, account_id in enumerate(accounts['account_id'])}
+    automation.assignment_alternatives = {}
+    settings = automation.scoring_rules['llm_review']
+    settings['cache']['enabled'] = False
+    settings['concurrency']['chunk_size'] = 10
+    automation.prescreen_assignments = lambda assignments, issues: assignments
+    prompts_sent = []
+
+    async def approve_all(prompts):
+        prompts_sent.extend(prompts)
+        return [{'approve': True, 'confidence_score': 90} for _ in prompts]
+
+    automation.review_prompts_concurrently = approve_all
+    should_rerun, _, _ = automation.review_assignments_with_llm(assignments, accounts, books)
+
+    assert not should_rerun
+    assert len(prompts_sent) == 6
+    # Rubric plus the first chunk's measurement; later chunks reuse its tokens per character
+    assert automation.claude_client.messages.count_calls == 2
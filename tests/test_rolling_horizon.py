@@ -0,0 +1,52 @@
+from conftest import make_accounts, make_books
+
+
+def test_backlog_is_fully_routed_when_chunks_exhaust_capacity(make_automation):
+    # 30 CSMs with 3 open spots each: after two chunks of 30 no CSM has the 2 spots
+    # a batch needs, so the last 15 accounts must go through the sequential fallback
+    books = make_books(30, 97)
+    automation = make_automation(books, max_accounts_per_csm=100)
+    accounts = make_accounts(75)
+
+    assignments = automation.optimize_backlog_rolling_horizon(accounts, books)
+
+    assert set(assignments) == set(accounts['account_id'])
+    placed = {}
+    for csm in assignments.values():
+        placed[csm] = placed.get(csm, 0) + 1
+    assert all(books[csm]['count'] + count <= 100 for csm, count in placed.items())
+
+
+def test_optimize_batch_returns_empty_dict_without_enough_csms(make_automation):
+    books = make_books(5, 99)
+    automation = make_automation(books, max_accounts_per_csm=100)
+
+    assert automation.optimize_batch_with_pulp(make_accounts(10), books) == {}
+
+
+def assert_alternatives_rank_assigned_first(automation, assignments):
+    for account_id, csm in assignments.items():
+        alternatives = automation.assignment_alternatives[account_id]
+        assert alternatives[0]['csm'] == csm
+        assert csm not in [alt['csm'] for alt in alternatives[1:]]
+
+
+def test_refined_backlog_alternatives_rank_assigned_csm_first(make_automation):
+    books = make_books(60, 60)
+    automation = make_automation(books, max_accounts_per_csm=100)
+    assert automation.scoring_rules['rolling_horizon']['refine']
+    accounts = make_accounts(140)
+
+    assignments = automation.optimize_backlog_rolling_horizon(accounts, books)
+
+    assert set(assignments) == set(accounts['account_id'])
+    assert_alternatives_rank_assigned_first(automation, assignments)
+
+
+def test_capacity_pressure_alternatives_rank_assigned_csm_first(make_automation):
+    books = make_books(30, 97)
+    automation = make_automation(books, max_accounts_per_csm=100)
+
+    assignments = automation.optimize_backlog_rolling_horizon(make_accounts(75), books)
+
+    assert_alternatives_rank_assigned_first(automation, assignments)
@@ -0,0 +1,29 @@
+import copy
+
+from conftest import make_accounts, make_books
+
+
+def test_update_routing_context_leaves_health_cache_unchanged(make_automation):
+    books = make_books(4, 60)
+    automation = make_automation(books)
+    cached = copy.deepcopy(automation.health_distribution_cache)
+    account = make_accounts(1).iloc[0]
+
+    context = automation.build_routing_context(books)
+    automation.update_routing_context(context, 'csm_00', account)
+
+    assert automation.health_distribution_cache == cached
+    projected = context['health_distributions']['csm_00']
+    assert projected['total'] == cached['csm_00']['total'] + 1
+    assert projected[account['health_segment']] == cached['csm_00'][account['health_segment']] + 1
+
+
+def test_sequential_fallback_does_not_inflate_health_cache(make_automation):
+    books = make_books(6, 60)
+    automation = make_automation(books)
+    cached = copy.deepcopy(automation.health_distribution_cache)
+
+    assignments = automation.assign_accounts_sequentially(make_accounts(4), books)
+
+    assert len(assignments) == 4
+    assert automation.health_distribution_cache == cached
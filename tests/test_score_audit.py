@@ -0,0 +1,30 @@
+import os
+
+from conftest import make_accounts, make_books
+
+
+def score_accounts(automation, books, num_accounts=3):
+    automation.start_score_audit('run_1')
+    routing_context = automation.build_routing_context(books)
+    for _, account in make_accounts(num_accounts).iterrows():
+        automation.assign_single_account_optimized(account, books, routing_context=routing_context)
+
+
+def test_score_audit_is_disabled_by_default(make_automation):
+    automation = make_automation(make_books(10, 60))
+
+    assert automation.scoring_rules['score_audit'].get('enabled') is False
+
+
+def test_persist_score_audit_writes_to_configured_directory(make_automation, tmp_path):
+    books = make_books(10, 60)
+    automation = make_automation(books)
+    automation.scoring_rules['score_audit']['directory'] = str(tmp_path / 'audit')
+    score_accounts(automation, books)
+
+    output_file = automation.persist_score_audit()
+
+    assert os.path.dirname(output_file) == str(tmp_path / 'audit')
+    assert os.path.basename(output_file).startswith('score_audit_run_1.')
+    assert os.path.exists(output_file)
+    assert not any(name.startswith('score_audit_') for name in os.listdir('.'))
@@ -0,0 +1,24 @@
+import logging
+
+import pytest
+
+import csm_routing_automation as routing
+from conftest import make_accounts, make_books
+
+
+@pytest.mark.parametrize('backend', ['gurobi', 'cpsat'])
+def test_backend_fallback_is_logged_and_reported(make_automation, caplog, backend):
+    if backend == 'cpsat' and routing.cp_model is not None:
+        pytest.skip('ortools is installed, so CP-SAT does not fall back')
+    books = make_books(12, 60)
+    automation = make_automation(books, max_accounts_per_csm=100)
+    automation.scoring_rules['batch_backend'] = backend
+
+    with caplog.at_level(logging.WARNING, logger=routing.logger.name):
+        assignments = automation.optimize_batch_with_pulp(make_accounts(6), books, store_recommendations=False)
+
+    assert len(assignments) == 6
+    assert automation.last_solve_stats['requested_backend'] == backend
+    assert automation.last_solve_stats['backend'] == 'cbc'
+    assert automation.solve_history[-1]['requested_backend'] == backend
+    assert any('using CBC' in record.getMessage() for record in caplog.records)